@@ -1,5 +1,7 @@
 import streamlit as st
 from modules.rag_pipeline import RAGPipeline
+from modules.spool import spill_upload
+from modules.vector_store import collection_for_kb, kb_for_collection, list_knowledge_bases, new_kb_id
 from modules.utils import TTSManager, format_quiz_questions, format_flashcards, clean_extracted_text, get_daily_quote, QuizTimer, PomodoroTimer
 import webbrowser
 
@@ -41,8 +43,15 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ==================== Initialize ====================
-if 'pipeline' not in st.session_state:
-    st.session_state.pipeline = RAGPipeline()
+# Each knowledge base is a collection picked by the ?kb= URL parameter (switch or start one from the sidebar).
+# A plain visit opens the shared default one. Models and clients are shared by all sessions.
+if 'kb' not in st.query_params:
+    st.query_params['kb'] = "default"
+collection_name = collection_for_kb(st.query_params['kb'])
+
+if st.session_state.get('collection_name') != collection_name:
+    st.session_state.pipeline = RAGPipeline(collection_name)
+    st.session_state.collection_name = collection_name
 
 if 'tts_manager' not in st.session_state:
     st.session_state.tts_manager = TTSManager()
@@ -50,6 +59,10 @@ if 'tts_manager' not in st.session_state:
 pipeline = st.session_state.pipeline
 tts = st.session_state.tts_manager
 
+# The embedding model loads in the background; upload and study tools work meanwhile
+pipeline.warm_up()
+kb_ready = pipeline.kb_ready or pipeline.warm_error is not None
+
 # ==================== Header ====================
 st.markdown("""
 <div class="main-header">
@@ -63,17 +76,48 @@ st.markdown("""
 with st.sidebar:
     st.header("📚 Knowledge Base")
     
-    stats = pipeline.get_vectorstore_stats()
-    st.markdown(f"""
+    current_kb = kb_for_collection(collection_name)
+    if kb_ready:
+        kb_ids = list_knowledge_bases()
+        if current_kb not in kb_ids:
+            # a new knowledge base is only stored once something is added to it
+            kb_ids.append(current_kb)
+        chosen_kb = st.selectbox("Knowledge base", kb_ids, index=kb_ids.index(current_kb),
+                                 help="Bookmark the page URL to come back to this knowledge base")
+        if chosen_kb != current_kb:
+            st.query_params['kb'] = chosen_kb
+            st.rerun()
+    if st.button("➕ New knowledge base", help="Start an empty knowledge base of your own"):
+        st.query_params['kb'] = new_kb_id()
+        st.rerun()
+    
+    if kb_ready:
+        stats = pipeline.get_vectorstore_stats()
+        st.markdown(f"""
     <div class="stat-box">
         <h2>{stats['total_chunks']}</h2>
         <p>Chunks in Knowledge Base</p>
     </div>
     """, unsafe_allow_html=True)
+    else:
+        stats = {"total_chunks": 0}
+        st.info("⏳ Loading the embedding model... Knowledge base features unlock on your next action.")
+    
+    sources = pipeline.list_sources() if kb_ready else {}
+    if sources:
+        with st.expander(f"📄 Sources ({len(sources)})"):
+            for source, count in sources.items():
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.caption(f"**{source}** · {count} chunks")
+                with col2:
+                    if st.button("🗑️", key=f"delete_source_{source}", help=f"Remove {source}"):
+                        pipeline.delete_source(source)
+                        st.rerun()
     
     st.divider()
     
-    if st.button("🗑️ Clear Knowledge Base", type="secondary"):
+    if st.button("🗑️ Clear Knowledge Base", type="secondary", disabled=not kb_ready):
         if pipeline.clear_vectorstore():
             st.success("✅ Knowledge base cleared!")
             st.rerun()
@@ -159,6 +203,14 @@ else:
         help="Upload multiple files at once"
     )
 
+# Large documents are parsed from a memory-mapped temp file instead of the upload buffer,
+# spilled once per upload and reused on later reruns (dropped once the file is removed)
+spilled = st.session_state.get('spilled_uploads', {})
+st.session_state.spilled_uploads = {
+    f.file_id: spilled.get(f.file_id) or spill_upload(f) for f in uploaded_files
+}
+uploaded_files = list(st.session_state.spilled_uploads.values())
+
 # Process uploaded files
 if uploaded_files:
     has_image = any(f.type.startswith("image/") for f in uploaded_files)
@@ -182,6 +234,15 @@ if uploaded_files:
             st.divider()
             st.subheader("🖼️ Image Analysis (OCR + AI)")
             
+            if len(st.session_state.uploaded_images) > 1:
+                if st.button("🤖 Explain All Images (OCR + AI)", key="explain_all_images", use_container_width=True):
+                    with st.spinner(f"🔍 Extracting text from {len(st.session_state.uploaded_images)} images..."):
+                        if 'image_explanations' not in st.session_state:
+                            st.session_state.image_explanations = {}
+                        st.session_state.image_explanations.update(
+                            pipeline.gemini.explain_images_with_ocr(st.session_state.uploaded_images)
+                        )
+            
             for img_file in st.session_state.uploaded_images:
                 with st.expander(f"📸 Analyze: {img_file.name}", expanded=True):
                     col1, col2 = st.columns([1, 2])
@@ -249,9 +310,15 @@ if uploaded_files:
         with col2:
             st.write("")
             st.write("")
-            if st.button("➕ Add to KB", type="primary"):
-                source_name = uploaded_files[0].name if len(uploaded_files) == 1 else "multiple_files"
-                pipeline.add_to_vectorstore(text, source_name)
+            if st.button("➕ Add to KB", type="primary", disabled=not kb_ready,
+                         help=None if kb_ready else "The embedding model is still loading"):
+                # One source per file, so each can be updated or removed on its own later
+                if not has_image:
+                    for uploaded_file in uploaded_files:
+                        pipeline.ingest_file(uploaded_file, uploaded_file.name)
+                else:
+                    source_name = ", ".join(f.name for f in uploaded_files)
+                    pipeline.add_to_vectorstore(text, source_name)
                 st.rerun()
         
         st.divider()
@@ -535,21 +602,30 @@ if uploaded_files:
             )
             
             top_k = st.slider("Number of Results", 1, 10, 5)
+            hybrid_search = st.checkbox("🔤 Hybrid search (keywords + meaning)", value=True,
+                                        help="Also match exact terms like formula names, acronyms or 'Theorem 3.2'")
             
-            if st.button("🔎 Search", type="primary"):
+            if st.button("🔎 Search", type="primary", disabled=not kb_ready):
                 if not search_query:
                     st.warning("⚠️ Please enter a search query!")
                 elif stats['total_chunks'] == 0:
                     st.warning("⚠️ Knowledge base is empty. Upload and add documents first!")
                 else:
                     with st.spinner("🔍 Searching..."):
-                        results = pipeline.semantic_search(search_query, top_k)
+                        results = pipeline.semantic_search(search_query, top_k, hybrid=hybrid_search)
                         
                         if results:
                             st.success(f"✅ Found {len(results)} relevant chunks")
                             
                             for idx, result in enumerate(results, 1):
-                                with st.expander(f"📄 Result {idx} - Relevance: {1 - result['distance']:.2%}"):
+                                # Keyword-only hybrid hits have no vector distance
+                                if result['distance'] is not None:
+                                    label = f"Relevance: {1 - result['distance']:.2%}"
+                                else:
+                                    label = "Keyword match"
+                                if 'score' in result:
+                                    label += f" · Hybrid score: {result['score']:.4f}"
+                                with st.expander(f"📄 Result {idx} - {label}"):
                                     st.markdown(result['content'])
                                     st.caption(f"Source: {result['metadata'].get('source', 'Unknown')}")
                         else:
@@ -0,0 +1,132 @@
+"""
+HNSW recall-vs-latency sweep for StudySphere AI
+Builds Chroma indexes over the sample corpus with different HNSW settings and reports
+recall@k against exact search, p50/p95 query latency and estimated index memory
+
+Usage: python benchmark_hnsw.py [--k 5] [--chunk-words 80] [file ...]
+"""
+
+import argparse
+import glob
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from modules.embedding_engine import create_embedding_engine
+from modules.file_loader import FileLoader
+from modules.vector_backends import hnsw_metadata
+from modules.vector_store import EMBEDDING_MODEL
+
+SPACES = ["l2", "cosine", "ip"]
+M_VALUES = [8, 16, 32]
+CONSTRUCTION_EF = [64, 200]
+SEARCH_EF = [10, 50, 200]
+
+
+def default_documents():
+    """Documents in data/, leaving out the sample images and their OCR ground-truth transcripts"""
+    images = {os.path.splitext(p)[0] for p in glob.glob("data/*.png") + glob.glob("data/*.jpg")}
+    return sorted(p for p in glob.glob("data/*")
+                  if not p.endswith((".png", ".jpg")) and os.path.splitext(p)[0] not in images)
+
+
+def load_chunks(paths, words):
+    loader = FileLoader(cache=None)
+    chunks = []
+    for path in paths:
+        tokens = (loader.load_file(path) or "").split()
+        chunks.extend(" ".join(tokens[i:i + words]) for i in range(0, len(tokens), max(1, words // 2)))
+    return [c for c in chunks if c]
+
+
+def exact_neighbours(vectors, queries, k, space):
+    if space == "l2":
+        dist = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        return np.argsort(dist, axis=1)[:, :k]
+    if space == "cosine":
+        v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        return np.argsort(-(q @ v.T), axis=1)[:, :k]
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+
+def index_bytes(n, dim, M):
+    """Estimated HNSW index memory: each vector plus its level-0 links (2*M neighbours) and label
+
+    Upper layers add about 1/ln(M) more links per element. This is what hnswlib allocates,
+    whereas the on-disk size of a small collection is mostly Chroma's SQLite database.
+    """
+    links = 2 * M * 4 + 4 + (M * 4 + 4) / np.log(M)
+    return n * (dim * 4 + links + 8)
+
+
+def run_config(vectors, queries, truth, k, settings):
+    path = tempfile.mkdtemp(prefix="hnsw_sweep_")
+    try:
+        client = chromadb.PersistentClient(path=path)
+        collection = client.create_collection("sweep", metadata=settings)
+        ids = [str(i) for i in range(len(vectors))]
+        for start in range(0, len(vectors), 1000):
+            collection.add(ids=ids[start:start + 1000], embeddings=vectors[start:start + 1000].tolist())
+
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            begin = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+            latencies.append(time.perf_counter() - begin)
+            found = {int(i) for i in result["ids"][0]}
+            recalls.append(len(found & set(expected.tolist())) / k)
+
+        del collection, client
+        size = index_bytes(len(vectors), vectors.shape[1], settings["hnsw:M"])
+        return np.mean(recalls), np.percentile(latencies, 50), np.percentile(latencies, 95), size
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-words", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    paths = args.files or default_documents()
+    chunks = load_chunks(paths, args.chunk_words)
+    if len(chunks) <= args.k:
+        print("Not enough text to benchmark")
+        return 1
+
+    engine = create_embedding_engine(EMBEDDING_MODEL)
+    vectors = np.asarray(engine.encode(chunks), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(chunks), size=min(args.queries, len(chunks)), replace=False)
+    queries = np.asarray(engine.encode([" ".join(chunks[i].split()[:15]) for i in sample]), dtype=np.float32)
+
+    print("=" * 84)
+    print(f"🧭 HNSW sweep - {len(chunks)} chunks, {len(queries)} queries, recall@{args.k} vs exact search")
+    print("=" * 84)
+    print(f"{'space':<7} {'M':>3} {'constr_ef':>9} {'search_ef':>9} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'est. MB':>9}")
+
+    for space in SPACES:
+        truth = exact_neighbours(vectors, queries, args.k, space)
+        for M, construction_ef, search_ef in itertools.product(M_VALUES, CONSTRUCTION_EF, SEARCH_EF):
+            settings = hnsw_metadata(space=space, M=M, construction_ef=construction_ef, search_ef=search_ef)
+            recall, p50, p95, size = run_config(vectors, queries, truth, args.k, settings)
+            print(f"{space:<7} {M:>3} {construction_ef:>9} {search_ef:>9} {recall:>7.3f} "
+                  f"{p50 * 1000:>7.2f} {p95 * 1000:>7.2f} {size / 2**20:>9.2f}")
+
+    print("\nApply a setting with HNSW_SPACE / HNSW_M / HNSW_CONSTRUCTION_EF / HNSW_SEARCH_EF "
+          "(new or cleared knowledge bases only).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Cold-start import-time check for StudySphere AI
+Imports the modules app.py needs with `python -X importtime` in a fresh interpreter,
+reports the slowest imports and fails if startup goes over budget or pulls in a heavy
+dependency that should only load on first use
+
+Usage: python benchmark_import_time.py [--budget-ms 400] [--runs 3] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# What app.py imports before the first page is drawn (streamlit is loaded first and not counted)
+APP_IMPORTS = [
+    "modules.rag_pipeline",
+    "modules.spool",
+    "modules.vector_store",
+    "modules.utils",
+]
+
+# Must not be imported until a feature actually needs them
+DEFERRED = [
+    "chromadb",
+    "sentence_transformers",
+    "torch",
+    "onnxruntime",
+    "google.generativeai",
+    "pytesseract",
+    "tesserocr",
+    "bs4",
+    "youtube_transcript_api",
+    "langdetect",
+    "gtts",
+    "PyPDF2",
+    "docx",
+    "pptx",
+]
+
+
+def measure():
+    """(total ms for APP_IMPORTS, {module: cumulative ms}) from one fresh interpreter"""
+    code = "import streamlit; " + "; ".join(f"import {m}" for m in APP_IMPORTS)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+
+    # Lines look like "import time:       123 |       4567 |   package.module"; the
+    # indentation of the name gives its depth, and depth-0 entries are what `code` imported
+    modules = {}
+    total_us = 0
+    after_streamlit = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        modules[name] = int(cumulative) / 1000
+        if depth == 0:
+            if after_streamlit:
+                total_us += int(cumulative)
+            if name == "streamlit":
+                after_streamlit = True
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "400")))
+    parser.add_argument("--runs", type=int, default=3, help="best of N fresh interpreters")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    try:
+        runs = [measure() for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"❌ Could not import the app modules: {e}")
+        return 1
+    total, modules = min(runs, key=lambda run: run[0])
+
+    print("=" * 60)
+    print(f"⏱️ App module import time (best of {args.runs}): {total:.0f} ms, budget {args.budget_ms:.0f} ms")
+    print("=" * 60)
+    app_modules = {name: ms for name, ms in modules.items() if name.startswith("modules")}
+    for name, ms in sorted(app_modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{ms:>9.1f} ms  {name}")
+
+    failed = False
+    loaded = [m for m in DEFERRED if m in modules]
+    if loaded:
+        print(f"\n❌ Heavy dependencies imported at startup: {', '.join(loaded)}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"\n❌ Import time {total:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\n✅ Startup imports within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+OCR preprocessing benchmark for StudySphere AI
+Compares latency and text agreement of each OCR preset on the sample images
+
+Usage: python benchmark_ocr.py [image ...]
+Accuracy is measured against the image's sibling .txt transcript (shipped for the sample
+images, e.g. data/selfrag.txt, which covers the slide text rather than the editor window
+around it). Images without one are compared against the unprocessed ("none") output,
+which favours "none" by construction.
+"""
+
+import glob
+import os
+import sys
+import time
+from difflib import SequenceMatcher
+
+from modules.ocr_engine import BatchOCREngine
+from modules.ocr_preprocess import PRESETS
+
+
+def word_similarity(a: str, b: str) -> float:
+    """Word-level similarity between two OCR outputs (1.0 = identical)"""
+    return SequenceMatcher(None, a.split(), b.split()).ratio()
+
+
+def default_images():
+    images = sorted(glob.glob("data/*.png") + glob.glob("data/*.jpg"))
+    if os.path.exists("test.png"):
+        images.append("test.png")
+    return images
+
+
+def run_preset(preset, images, repeats=3):
+    """Median seconds per image and the OCR text for each image"""
+    engine = BatchOCREngine(workers=1, preset=preset, cache_size=0)
+    timings, texts = {}, {}
+    for path in images:
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            texts[path] = engine.extract_text(path)
+            runs.append(time.perf_counter() - start)
+        timings[path] = sorted(runs)[len(runs) // 2]
+    return timings, texts
+
+
+def main():
+    images = sys.argv[1:] or default_images()
+    if not images:
+        print("No images found")
+        return 1
+
+    print("=" * 72)
+    print("🖼️  OCR Preprocessing Benchmark")
+    print("=" * 72)
+
+    results = {preset: run_preset(preset, images) for preset in PRESETS}
+    _, baseline_texts = results["none"]
+
+    for path in images:
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as f:
+                reference, label = f.read(), "ground truth"
+        else:
+            reference, label = baseline_texts[path], "'none' output"
+
+        print(f"\n{path}  (accuracy vs {label})")
+        print(f"  {'preset':<10} {'latency':>10} {'speed-up':>9} {'accuracy':>9}")
+        base_time = results["none"][0][path]
+        for preset, (timings, texts) in results.items():
+            accuracy = word_similarity(texts[path], reference)
+            speedup = base_time / timings[path] if timings[path] else 0
+            print(f"  {preset:<10} {timings[path] * 1000:>8.0f}ms {speedup:>8.2f}x {accuracy:>8.1%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
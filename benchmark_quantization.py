@@ -0,0 +1,96 @@
+"""
+Compact vector storage report for StudySphere AI
+Memory per chunk and recall@k of float16 / int8 storage against exact float32 search
+
+Usage: python benchmark_quantization.py [file ...]   (defaults to the documents in data/)
+"""
+
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from modules.embedding_engine import create_embedding_engine
+from modules.file_loader import FileLoader
+from modules.quantized_index import QuantizedIndex
+from modules.vector_store import EMBEDDING_MODEL
+
+K_VALUES = (1, 5, 10)
+
+
+def default_documents():
+    """Documents in data/, leaving out the sample images and their OCR ground-truth transcripts"""
+    images = {os.path.splitext(p)[0] for p in glob.glob("data/*.png") + glob.glob("data/*.jpg")}
+    return sorted(p for p in glob.glob("data/*")
+                  if not p.endswith((".png", ".jpg")) and os.path.splitext(p)[0] not in images)
+
+
+def load_chunks(paths, words=120):
+    loader = FileLoader(cache=None)
+    chunks = []
+    for path in paths:
+        text = loader.load_file(path) or ""
+        tokens = text.split()
+        chunks.extend(" ".join(tokens[i:i + words]) for i in range(0, len(tokens), words // 2))
+    return [c for c in chunks if c]
+
+
+def exact_top_k(matrix, query, k):
+    return set(np.argsort(-(matrix @ query))[:k].tolist())
+
+
+def main():
+    paths = sys.argv[1:] or default_documents()
+    chunks = load_chunks(paths)
+    if len(chunks) < 20:
+        print("Not enough text to benchmark")
+        return 1
+
+    engine = create_embedding_engine(EMBEDDING_MODEL)
+    vectors = np.asarray(engine.encode(chunks), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Queries: opening words of a sample of chunks, so they are close to but not identical to a chunk
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(chunks), size=min(100, len(chunks)), replace=False)
+    queries = np.asarray(engine.encode([" ".join(chunks[i].split()[:15]) for i in sample]), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print("=" * 78)
+    print(f"📦 Vector storage report - {len(chunks)} chunks x {vectors.shape[1]} dims, {len(queries)} queries")
+    print("=" * 78)
+    print(f"{'mode':<18} {'bytes/chunk':>11} {'RAM @10k':>9} " + " ".join(f"{'R@' + str(k):>6}" for k in K_VALUES) + f" {'p50 ms':>7}")
+
+    float32_bytes = vectors.shape[1] * 4
+    print(f"{'float32 (exact)':<18} {float32_bytes:>11} {float32_bytes * 10000 / 2**20:>7.1f}MB "
+          + " ".join(f"{1.0:>6.3f}" for _ in K_VALUES) + f" {'-':>7}")
+
+    ids = [str(i) for i in range(len(chunks))]
+    for dtype, rescore in [("float16", False), ("int8", False), ("int8", True)]:
+        index = QuantizedIndex(dim=vectors.shape[1], dtype=dtype, rescore=rescore)
+        index.upsert(ids, vectors, chunks, [{} for _ in chunks])
+
+        recalls = {k: [] for k in K_VALUES}
+        latencies = []
+        for query in queries:
+            for k in K_VALUES:
+                start = time.perf_counter()
+                rows, _ = index.query(query, k)
+                latencies.append(time.perf_counter() - start)
+                recalls[k].append(len(exact_top_k(vectors, query, k) & set(rows)) / k)
+
+        per_chunk = index.memory_bytes() / len(chunks)
+        name = f"{dtype}{' + rescore' if rescore else ''}"
+        print(f"{name:<18} {per_chunk:>11.0f} {per_chunk * 10000 / 2**20:>7.1f}MB "
+              + " ".join(f"{np.mean(recalls[k]):>6.3f}" for k in K_VALUES)
+              + f" {np.median(latencies) * 1000:>7.2f}")
+        index.clear()
+
+    print("\nRAM excludes chunk text; rescoring keeps float32 originals in an on-disk memmap.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,28 @@
-from .file_loader import FileLoader
-from .gemini_processor import GeminiProcessor
-from .vector_store import VectorStore
-from .rag_pipeline import RAGPipeline
-from .utils import TTSManager, copy_to_clipboard, format_quiz_questions, format_flashcards
+import importlib
 
-__all__ = [
-    'FileLoader',
-    'GeminiProcessor', 
-    'VectorStore',
-    'RAGPipeline',
-    'TTSManager',
-    'copy_to_clipboard',
-    'format_quiz_questions',
-    'format_flashcards'
-]
\ No newline at end of file
+# Exports are resolved on first access so importing one submodule doesn't pull in every heavy dependency
+_EXPORTS = {
+    'FileLoader': '.file_loader',
+    'GeminiProcessor': '.gemini_processor',
+    'VectorStore': '.vector_store',
+    'RAGPipeline': '.rag_pipeline',
+    'TTSManager': '.utils',
+    'copy_to_clipboard': '.utils',
+    'format_quiz_questions': '.utils',
+    'format_flashcards': '.utils'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,81 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# Keeps dotted numbers ("3.2", "1.0.4") and alphanumerics ("h2o", "mp3") as single terms
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Incrementally maintained in-process inverted index with Okapi BM25 scoring"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version with the same id"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            self._doc_terms[doc_id] = terms
+            self._doc_len[doc_id] = sum(terms.values())
+            self._total_len += self._doc_len[doc_id]
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        for doc_id, text in items:
+            self.add(doc_id, text)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            terms = self._doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self._total_len -= self._doc_len.pop(doc_id)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_len.clear()
+            self._total_len = 0
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs for the query terms"""
+        with self._lock:
+            n = len(self._doc_terms)
+            if n == 0:
+                return []
+            avg_len = self._total_len / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
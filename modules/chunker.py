@@ -0,0 +1,110 @@
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple
+
+# A sentence ends at ., ! or ? (plus closing quotes/brackets) followed by whitespace, or at a blank line
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+WORD_RE = re.compile(r"\S+")
+APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Pages are treated as if joined with a blank line, which also makes every page break a sentence break
+PAGE_SEPARATOR = "\n\n"
+
+
+class Chunk(NamedTuple):
+    """A chunk as a character span of its document; text is document[start:end]"""
+    doc_id: str
+    start: int
+    end: int
+    text: str
+
+
+def approx_token_counts(texts: List[str]) -> List[int]:
+    """Rough WordPiece token counts for when no tokenizer is available (errs on the high side)"""
+    return [int(len(APPROX_TOKEN_RE.findall(t)) * 1.3) + 1 for t in texts]
+
+
+def _sentence_spans(text: str, offset: int):
+    """(start, end) document offsets of the sentences in one page, whitespace trimmed"""
+    pos = 0
+    for match in SENTENCE_BREAK_RE.finditer(text):
+        if match.start() > pos:
+            yield offset + pos, offset + match.start()
+        pos = match.end()
+    tail = text[pos:].rstrip()
+    if tail:
+        start = pos + len(text[pos:]) - len(text[pos:].lstrip())
+        yield offset + start, offset + pos + len(tail)
+
+
+def iter_chunks(pages: Iterable[str], doc_id: str = "", max_tokens: int = 254, overlap_tokens: int = 32,
+                count_tokens: Callable[[List[str]], List[int]] = approx_token_counts) -> Iterator[Chunk]:
+    """Pack whole sentences into chunks of at most max_tokens, streaming page by page
+
+    Consecutive chunks share trailing sentences worth up to overlap_tokens.
+    Sentences longer than max_tokens are split at word boundaries. Only the
+    text of the chunk being built is held in memory.
+    """
+    buffer = ""   # document text from offset `base` onwards
+    base = 0
+    doc_len = 0
+    pending = []  # (start, end, tokens) of sentences in the chunk being built
+    total = 0
+    fresh = 0     # sentences in pending that have not been emitted yet
+
+    def emit():
+        start, end = pending[0][0], pending[-1][1]
+        return Chunk(doc_id, start, end, buffer[start - base:end - base])
+
+    for page in pages:
+        if not page or not page.strip():
+            continue
+        if doc_len:
+            buffer += PAGE_SEPARATOR
+            doc_len += len(PAGE_SEPARATOR)
+        offset = doc_len
+        buffer += page
+        doc_len += len(page)
+
+        spans = list(_sentence_spans(page, offset))
+        counts = count_tokens([buffer[s - base:e - base] for s, e in spans])
+        for (start, end), tokens in zip(spans, counts):
+            for piece in _split_long(buffer, base, start, end, tokens, max_tokens, count_tokens):
+                if pending and total + piece[2] > max_tokens:
+                    yield emit()
+                    # carry trailing sentences over as overlap, as long as the next one still fits
+                    keep, kept = [], 0
+                    for sentence in reversed(pending):
+                        if kept + sentence[2] > overlap_tokens or kept + sentence[2] + piece[2] > max_tokens:
+                            break
+                        keep.insert(0, sentence)
+                        kept += sentence[2]
+                    pending, total, fresh = keep, kept, 0
+                    cut = pending[0][0] if pending else piece[0]
+                    buffer = buffer[cut - base:]
+                    base = cut
+                pending.append(piece)
+                total += piece[2]
+                fresh += 1
+
+    if pending and fresh:
+        yield emit()
+
+
+def _split_long(buffer, base, start, end, tokens, max_tokens, count_tokens):
+    """A sentence as one (start, end, tokens) piece, or word-boundary pieces if it exceeds max_tokens"""
+    if tokens <= max_tokens:
+        yield start, end, tokens
+        return
+    words = [(start + m.start(), start + m.end()) for m in WORD_RE.finditer(buffer[start - base:end - base])]
+    counts = count_tokens([buffer[s - base:e - base] for s, e in words])
+    piece_start, piece_end, piece_tokens = None, None, 0
+    for (s, e), n in zip(words, counts):
+        if piece_start is not None and piece_tokens + n > max_tokens:
+            yield piece_start, piece_end, piece_tokens
+            piece_start, piece_tokens = None, 0
+        if piece_start is None:
+            piece_start = s
+        piece_end = e
+        piece_tokens += n
+    if piece_start is not None:
+        yield piece_start, piece_end, piece_tokens
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """Stable key for a chunk's text, independent of where the chunk came from"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe in-process LRU of embeddings keyed by content hash, bounded by memory
+
+    Vectors are kept as float32 arrays (1.5 KB for MiniLM) rather than lists of
+    Python floats, which cost roughly eight times as much.
+    """
+
+    def __init__(self, max_mb: float = None, max_items: int = None):
+        if max_mb is None:
+            max_mb = float(os.getenv("EMBED_CACHE_MB", "32"))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for h in hashes:
+                vector = self._items.get(h)
+                if vector is not None:
+                    self._items.move_to_end(h)
+                    found[h] = vector
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            for h, vector in items.items():
+                vector = np.asarray(vector, dtype=np.float32)
+                previous = self._items.pop(h, None)
+                if previous is not None:
+                    self._bytes -= previous.nbytes
+                self._items[h] = vector
+                self._bytes += vector.nbytes
+            while self._items and (self._bytes > self.max_bytes or
+                                   (self.max_items is not None and len(self._items) > self.max_items)):
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def get(self, h: str) -> Optional[np.ndarray]:
+        return self.get_many([h]).get(h)
+
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide chunk embedding cache; content-hash keys make it safe to share across sessions"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
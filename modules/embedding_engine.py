@@ -0,0 +1,280 @@
+import atexit
+import os
+import threading
+import time
+from typing import List
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Below this many texts a multi-process pool costs more than it saves
+MULTIPROCESS_MIN_TEXTS = 256
+
+
+class EmbeddingEngine:
+    """Sentence-transformer encoder with adaptive batching and an optional process pool
+
+    Instances are callable with a list of texts, so they also serve as the
+    Chroma embedding function for query_texts lookups.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, processes=None, batch_size=None,
+                 min_batch=8, max_batch=256, max_length=256):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.processes = processes if processes is not None else int(os.getenv("EMBED_PROCESSES", "1"))
+        if self.processes <= 0:
+            self.processes = os.cpu_count() or 1
+        fixed = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "0"))
+        self.batch_size = fixed or 32
+        self.adaptive = not fixed
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self._best_rate = 0.0
+        self._model = None
+        self._tokenizer = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.warm_error = None
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device="cpu")
+            return self._model
+
+    @property
+    def max_tokens(self) -> int:
+        """Text tokens that fit in the model window (excluding [CLS] / [SEP])"""
+        return self.max_length - 2
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """WordPiece token counts, loading only the tokenizer rather than the full model"""
+        with self._lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{self.model_name}")
+        return [len(ids) for ids in self._tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        # Chroma's EmbeddingFunction protocol requires the parameter to be called `input`
+        return self.encode(list(input))
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, spreading large requests over the process pool when enabled"""
+        if not texts:
+            return []
+        if self.processes > 1 and len(texts) >= MULTIPROCESS_MIN_TEXTS:
+            return self._encode_multi_process(texts)
+
+        vectors = []
+        i = 0
+        while i < len(texts):
+            batch = texts[i:i + self.batch_size]
+            try:
+                start = time.perf_counter()
+                vectors.extend(self._encode_batch(batch))
+                self._adapt(len(batch), time.perf_counter() - start)
+            except (MemoryError, RuntimeError) as e:
+                if isinstance(e, RuntimeError) and "memory" not in str(e).lower():
+                    raise
+                if self.batch_size <= self.min_batch:
+                    raise
+                # Retry the same slice with half the batch
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+                self.max_batch = self.batch_size
+                continue
+            i += len(batch)
+        self._ready.set()
+        return vectors
+
+    @property
+    def ready(self) -> bool:
+        """True once the model is loaded and has encoded at least one batch"""
+        return self._ready.is_set()
+
+    def warm_up(self):
+        """Load the model and encode one tiny batch so the first real request doesn't wait for it"""
+        try:
+            self.encode(["warm up"])
+        except Exception as e:
+            self.warm_error = e
+
+    @property
+    def pool_batch(self) -> int:
+        """Texts per encode() call needed to reach the process pool (0 when there is none)"""
+        return MULTIPROCESS_MIN_TEXTS if self.processes > 1 else 0
+
+    def _encode_batch(self, batch):
+        # batch_size=len(batch) so the adaptive size is the real forward-pass size, not re-split into 32s
+        return self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True).tolist()
+
+    def _adapt(self, size, elapsed):
+        """Grow the batch while throughput keeps improving, back off when it drops"""
+        if not self.adaptive or size < self.batch_size or elapsed <= 0:
+            return
+        rate = size / elapsed
+        if rate > self._best_rate * 1.05:
+            self._best_rate = rate
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+        elif rate < self._best_rate * 0.8:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    def _encode_multi_process(self, texts):
+        with self._lock:
+            if self._pool is None:
+                model = self._model
+                if model is None:
+                    from sentence_transformers import SentenceTransformer
+                    model = self._model = SentenceTransformer(self.model_name, device="cpu")
+                self._pool = model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+                atexit.register(self.close)
+            pool = self._pool
+        chunk = max(self.batch_size, len(texts) // (self.processes * 4))
+        return self._model.encode_multi_process(
+            texts, pool, batch_size=self.batch_size, chunk_size=chunk
+        ).tolist()
+
+    def close(self):
+        """Stop the encode worker processes, if any were started"""
+        with self._lock:
+            if self._pool is not None:
+                from sentence_transformers import SentenceTransformer
+                SentenceTransformer.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "studysphere", "onnx")
+
+
+def onnx_model_dir(model_name=DEFAULT_MODEL):
+    return os.path.join(os.getenv("ONNX_MODEL_DIR") or DEFAULT_ONNX_DIR, model_name)
+
+
+def export_onnx(model_name=DEFAULT_MODEL, out_dir=None, quantize=True):
+    """Export the transformer behind a sentence-transformer to ONNX (+ dynamic int8 copy)
+
+    Needs torch only at export time; the ONNX backend itself runs without it.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = out_dir or onnx_model_dir(model_name)
+    os.makedirs(out_dir, exist_ok=True)
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    st_model.tokenizer.save_pretrained(out_dir)
+
+    sample = st_model.tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    return out_dir
+
+
+class OnnxEmbeddingEngine(EmbeddingEngine):
+    """all-MiniLM-L6-v2 on onnxruntime: same vectors as the torch backend, no torch import
+
+    Mean pooling + L2 normalisation reproduce the sentence-transformers pipeline.
+    Parallelism comes from onnxruntime's intra-op threads, not a process pool.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, quantized=False, model_dir=None,
+                 max_length=256, threads=None, **kwargs):
+        kwargs["processes"] = 1
+        super().__init__(model_name, max_length=max_length, **kwargs)
+        self.quantized = quantized
+        self.model_dir = model_dir or onnx_model_dir(model_name)
+        self.threads = threads or int(os.getenv("ONNX_THREADS", "0"))
+        self._session = None
+
+    def _load(self):
+        with self._lock:
+            if self._session is None:
+                import onnxruntime as ort
+                from tokenizers import Tokenizer
+
+                filename = "model.int8.onnx" if self.quantized else "model.onnx"
+                path = os.path.join(self.model_dir, filename)
+                if not os.path.exists(path):
+                    export_onnx(self.model_name, self.model_dir, quantize=self.quantized)
+
+                options = ort.SessionOptions()
+                if self.threads:
+                    options.intra_op_num_threads = self.threads
+                self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+                self._input_names = {i.name for i in self._session.get_inputs()}
+
+                tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+                tokenizer.enable_truncation(max_length=self.max_length)
+                tokenizer.enable_padding()
+                self._tokenizer = tokenizer
+        return self._session, self._tokenizer
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        _, tokenizer = self._load()
+        # the shared tokenizer pads (so count the mask) and truncates (anything at the cap is over budget anyway)
+        return [sum(e.attention_mask) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    def _encode_batch(self, batch):
+        import numpy as np
+
+        session, tokenizer = self._load()
+        encodings = tokenizer.encode_batch(batch)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        inputs = {name: value for name, value in inputs.items() if name in self._input_names}
+        hidden = session.run(None, inputs)[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+def create_embedding_engine(model_name=DEFAULT_MODEL, backend=None):
+    """Build the embedding engine selected by EMBED_BACKEND: torch (default), onnx or onnx-int8"""
+    backend = (backend or os.getenv("EMBED_BACKEND", "torch")).lower()
+    if backend == "torch":
+        return EmbeddingEngine(model_name)
+    if backend == "onnx":
+        return OnnxEmbeddingEngine(model_name)
+    if backend == "onnx-int8":
+        return OnnxEmbeddingEngine(model_name, quantized=True)
+    raise ValueError(f"Unknown EMBED_BACKEND '{backend}'. Choose torch, onnx or onnx-int8.")
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_embedding_engine(model_name=DEFAULT_MODEL, backend=None):
+    """Process-wide embedding engine shared by every session (one model copy per model/backend)"""
+    backend = (backend or os.getenv("EMBED_BACKEND", "torch")).lower()
+    with _engines_lock:
+        engine = _engines.get((model_name, backend))
+        if engine is None:
+            engine = _engines[(model_name, backend)] = create_embedding_engine(model_name, backend)
+        return engine
@@ -1,40 +1,268 @@
+import functools
+import io
 import os
-from PyPDF2 import PdfReader
-from docx import Document
-from pptx import Presentation
-from PIL import Image
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from modules.text_cache import TextCache
+from modules.spool import MappedFile, open_source
+from modules.ooxml_stream import iter_docx_sections, iter_pptx_slides
+
+# PDFs shorter than this are parsed in-process; pool start-up would cost more than it saves
+PARALLEL_PDF_MIN_PAGES = 16
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    """Read an optional integer setting from the environment"""
+    value = os.getenv(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def _get_pdf_pool(workers):
+    """Create the shared parser worker pool (PDF page ranges and whole documents) on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn: forking the multi-threaded Streamlit server is not safe
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _extract_pdf_pages(source, start, end, reader=None):
+    """Extract text for pages [start, end) - runs inside worker processes
+
+    source is either the PDF bytes or the path of a spilled upload, which the
+    worker maps itself so the document is never pickled across processes.
+    """
+    if reader is None:
+        if isinstance(source, str):
+            with MappedFile(source) as f:
+                return _extract_pdf_pages(source, start, end, _pdf_reader(f))
+        reader = _pdf_reader(io.BytesIO(source))
+    pages = []
+    for i in range(start, end):
+        pages.append(reader.pages[i].extract_text() or "")
+    return pages
+
+
+def _pdf_reader(stream):
+    # PyPDF2 is only imported once a PDF actually shows up
+    from PyPDF2 import PdfReader
+    return PdfReader(stream)
+
+
+def _open_pdf(file):
+    """Return (worker source, in-process reader) for a PDF upload or spilled file"""
+    if isinstance(file, MappedFile):
+        return file.path, _pdf_reader(file)
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    return data, _pdf_reader(io.BytesIO(data))
+
+
+# Loaders whose parsing is CPU-bound, so load_multiple_files runs them in the process pool.
+# Maps the registered loader to the cached method the worker runs (PDFs are cached as pages).
+_PROCESS_LOADERS = {"load_pdf": "load_pdf_pages", "load_docx": "load_docx", "load_pptx": "load_pptx"}
+
+
+def _parse_in_worker(method, source, max_pdf_pages):
+    """Run one FileLoader parser on a whole document - runs inside worker processes
+
+    source is the document bytes or the path of a spilled upload, as for _extract_pdf_pages.
+    """
+    loader = FileLoader(max_pdf_pages=max_pdf_pages, pdf_workers=1)
+    # The parent process reads and fills the text cache
+    loader.cache = None
+    file = MappedFile(source) if isinstance(source, str) else io.BytesIO(source)
+    try:
+        return getattr(loader, method)(file)
+    finally:
+        file.close()
+
+
+# Loader registry: MIME type / MIME prefix / file extension -> FileLoader method names.
+# Parser libraries are imported inside the loader methods, so registering costs nothing.
+_LOADERS_BY_MIME = {}
+_LOADERS_BY_PREFIX = {}
+_LOADERS_BY_EXT = {}
+
+
+def register_loader(mime_types=(), extensions=(), mime_prefix=None, pages=None):
+    """Register a FileLoader method for the given MIME types and extensions
+
+    `pages` optionally names a method that yields the document page by page,
+    which the streaming ingest uses instead of loading the whole text.
+    """
+    def decorator(method):
+        entry = (method.__name__, pages)
+        for mime in mime_types:
+            _LOADERS_BY_MIME[mime] = entry
+        for ext in extensions:
+            _LOADERS_BY_EXT[ext.lower()] = entry
+        if mime_prefix:
+            _LOADERS_BY_PREFIX[mime_prefix] = entry
+        return method
+    return decorator
+
+
+def _lookup_loader(file):
+    mime = getattr(file, "type", None) or ""
+    if mime in _LOADERS_BY_MIME:
+        return _LOADERS_BY_MIME[mime]
+    for prefix, entry in _LOADERS_BY_PREFIX.items():
+        if mime.startswith(prefix):
+            return entry
+    name = getattr(file, "name", None) or (os.fspath(file) if isinstance(file, (str, os.PathLike)) else "")
+    return _LOADERS_BY_EXT.get(os.path.splitext(name)[1].lower())
+
+
+def _cached(method):
+    """Serve a loader's result from the text cache, keyed by file content"""
+    @functools.wraps(method)
+    def wrapper(self, file):
+        file = open_source(file)
+        if self.cache is None:
+            return method(self, file)
+        
+        key = self.cache.key_for(file, method.__name__, self.max_pdf_pages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = method(self, file)
+        if result:
+            self.cache.put(key, result)
+        return result
+    return wrapper
+
 
 class FileLoader:
-    def __init__(self):
-        pass
+    def __init__(self, max_pdf_pages=None, pdf_workers=None, cache=None):
+        # 0 / unset means "read every page"
+        self.max_pdf_pages = max_pdf_pages if max_pdf_pages is not None else _env_int("PDF_MAX_PAGES", 0)
+        self.pdf_workers = pdf_workers or _env_int("PDF_WORKERS", os.cpu_count() or 1)
+        
+        if cache is None and os.getenv("TEXT_CACHE", "1") != "0":
+            try:
+                cache = TextCache()
+            except OSError as e:
+                # e.g. a read-only home directory - extraction still works, just uncached
+                st.warning(f"Text cache disabled: {e}")
+        self.cache = cache
     
+    @register_loader(["application/pdf"], [".pdf"], pages="iter_pdf_pages")
     def load_pdf(self, file):
-        """Extract text from PDF"""
+        """Extract text from PDF, splitting large documents across a process pool"""
         try:
-            reader = PdfReader(file)
-            text = ""
-            total_pages = len(reader.pages)
-            
-            # Limit to first 50 pages for speed
-            pages_to_read = min(total_pages, 50)
-            
-            for i in range(pages_to_read):
-                page_text = reader.pages[i].extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            
-            if total_pages > 50:
-                st.info(f"📄 Processed first 50 of {total_pages} pages for faster performance")
-            
-            return text.strip()
+            pages = self.load_pdf_pages(file)
+            return "\n".join(page for page in pages if page).strip()
         except Exception as e:
             st.error(f"Error reading PDF: {e}")
             return ""
     
+    @_cached
+    def load_pdf_pages(self, file):
+        """Extract the text of each PDF page, in page order"""
+        source, reader = _open_pdf(file)
+        total_pages = len(reader.pages)
+        
+        pages_to_read = total_pages
+        if self.max_pdf_pages:
+            pages_to_read = min(total_pages, self.max_pdf_pages)
+        
+        if pages_to_read >= PARALLEL_PDF_MIN_PAGES and self.pdf_workers > 1:
+            pages = self._extract_pdf_parallel(source, pages_to_read)
+        else:
+            pages = _extract_pdf_pages(source, 0, pages_to_read, reader)
+        
+        if total_pages > pages_to_read:
+            st.info(f"📄 Processed first {pages_to_read} of {total_pages} pages (PDF_MAX_PAGES={self.max_pdf_pages})")
+        
+        return pages
+    
+    def iter_pdf_pages(self, file):
+        """Yield PDF page texts in order as soon as each page range is extracted"""
+        file = open_source(file)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key_for(file, "load_pdf_pages", self.max_pdf_pages)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield from cached
+                return
+        
+        pages = []
+        for page in self._iter_pdf_pages_uncached(file):
+            pages.append(page)
+            yield page
+        
+        if key is not None and any(pages):
+            self.cache.put(key, pages)
+    
+    def _iter_pdf_pages_uncached(self, file):
+        source, reader = _open_pdf(file)
+        num_pages = len(reader.pages)
+        if self.max_pdf_pages:
+            num_pages = min(num_pages, self.max_pdf_pages)
+        
+        if num_pages >= PARALLEL_PDF_MIN_PAGES and self.pdf_workers > 1:
+            for pages in self._iter_pdf_parallel(source, num_pages):
+                yield from pages
+        else:
+            for i in range(num_pages):
+                yield reader.pages[i].extract_text() or ""
+    
+    def _extract_pdf_parallel(self, source, num_pages):
+        """Fan page ranges out to worker processes and reassemble them in page order"""
+        pages = []
+        for range_pages in self._iter_pdf_parallel(source, num_pages):
+            pages.extend(range_pages)
+        return pages
+    
+    def _iter_pdf_parallel(self, source, num_pages):
+        """Submit every page range up front and yield the results in page order"""
+        # Two ranges per worker evens out uneven pages without shipping in-memory PDFs too often
+        num_ranges = min(num_pages, self.pdf_workers * 2)
+        step = -(-num_pages // num_ranges)
+        ranges = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+        
+        pool = _get_pdf_pool(self.pdf_workers)
+        futures = [pool.submit(_extract_pdf_pages, source, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    @register_loader(["application/vnd.openxmlformats-officedocument.wordprocessingml.document"], [".docx"])
+    @_cached
     def load_docx(self, file):
         """Extract text from DOCX"""
         try:
+            return "\n".join(iter_docx_sections(file)).strip()
+        except (zipfile.BadZipFile, KeyError, ET.ParseError):
+            # Unusual packaging - let python-docx have a go
+            file.seek(0)
+        except Exception as e:
+            st.error(f"Error reading DOCX: {e}")
+            return ""
+        
+        try:
+            from docx import Document
             doc = Document(file)
             text = "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
             return text.strip()
@@ -42,9 +270,21 @@ class FileLoader:
             st.error(f"Error reading DOCX: {e}")
             return ""
     
+    @register_loader(["application/vnd.openxmlformats-officedocument.presentationml.presentation"], [".pptx"])
+    @_cached
     def load_pptx(self, file):
         """Extract text from PPTX"""
         try:
+            return "\n".join(iter_pptx_slides(file)).strip()
+        except (zipfile.BadZipFile, KeyError, ET.ParseError):
+            # Unusual packaging - let python-pptx have a go
+            file.seek(0)
+        except Exception as e:
+            st.error(f"Error reading PPTX: {e}")
+            return ""
+        
+        try:
+            from pptx import Presentation
             prs = Presentation(file)
             text = ""
             for slide in prs.slides:
@@ -56,6 +296,7 @@ class FileLoader:
             st.error(f"Error reading PPTX: {e}")
             return ""
     
+    @register_loader(extensions=[".png", ".jpg", ".jpeg"], mime_prefix="image/")
     def load_image(self, file):
         """Process image - return placeholder text for Gemini Vision"""
         try:
@@ -66,43 +307,127 @@ class FileLoader:
             st.info("📸 Image uploaded! AI will analyze the image content directly.")
             
             # Return a placeholder that signals we have an image
-            return f"[IMAGE_CONTENT: {file.name}]"
+            name = getattr(file, "name", None) or os.path.basename(os.fspath(file))
+            return f"[IMAGE_CONTENT: {name}]"
             
         except Exception as e:
             st.error(f"Error loading image: {e}")
             return ""
     
+    @register_loader(["text/plain"], [".txt"])
+    @_cached
     def load_txt(self, file):
         """Load plain text file"""
         try:
+            file.seek(0)
             text = file.read().decode("utf-8")
             return text.strip()
         except Exception as e:
             st.error(f"Error reading text file: {e}")
             return ""
     
-    def load_multiple_files(self, files):
-        """Load multiple files and combine text"""
-        combined_text = ""
+    def loader_for(self, file):
+        """Bound loader method for a file's MIME type / extension, or None"""
+        entry = _lookup_loader(file)
+        return getattr(self, entry[0]) if entry else None
+    
+    def load_file(self, file):
+        """Load any supported file through the loader registry"""
+        loader = self.loader_for(file)
+        if loader is None:
+            st.warning(f"Unsupported file type: {getattr(file, 'type', None) or getattr(file, 'name', file)}")
+            return ""
+        return loader(file)
+    
+    def iter_pages(self, file):
+        """Yield a file's text page by page; formats without pages yield one block"""
+        entry = _lookup_loader(file)
+        if entry and entry[1]:
+            yield from getattr(self, entry[1])(file)
+            return
+        text = self.load_file(file)
+        if text:
+            yield text
+    
+    @staticmethod
+    def supported_types():
+        """Registered MIME types and extensions (handy for per-format benchmarks)"""
+        return sorted(_LOADERS_BY_MIME) + sorted(f"{p}*" for p in _LOADERS_BY_PREFIX), sorted(_LOADERS_BY_EXT)
+    
+    def _load_one(self, file):
+        """Load a single file for load_multiple_files; returns (text, seconds)"""
+        start = time.perf_counter()
+        text = self._load_in_process(file)
+        if not text:
+            # Worker processes can't write to the page, so failures (and empty documents)
+            # are re-read here, where the loader's own error reporting reaches the user
+            text = self.load_file(file)
+        return text, time.perf_counter() - start
+    
+    def _load_in_process(self, file):
+        """Parse a PDF/DOCX/PPTX in the worker pool (the calling thread just waits); None for other formats"""
+        entry = _lookup_loader(file)
+        method = _PROCESS_LOADERS.get(entry[0]) if entry else None
+        if method is None or self.pdf_workers < 2:
+            return None
         
-        for file in files:
-            st.info(f"Processing: {file.name}")
-            
-            if file.type == "application/pdf":
-                text = self.load_pdf(file)
-            elif file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                text = self.load_docx(file)
-            elif file.type == "application/vnd.openxmlformats-officedocument.presentationml.presentation":
-                text = self.load_pptx(file)
-            elif file.type.startswith("image/"):
-                text = self.load_image(file)
-            elif file.type == "text/plain":
-                text = self.load_txt(file)
+        file = open_source(file)
+        key = self.cache.key_for(file, method, self.max_pdf_pages) if self.cache is not None else None
+        result = self.cache.get(key) if key is not None else None
+        if result is None:
+            if isinstance(file, MappedFile):
+                source = file.path
             else:
-                st.warning(f"Unsupported file type: {file.type}")
-                continue
-            
-            if text:
-                combined_text += f"\n\n--- Content from {file.name} ---\n\n{text}"
+                source = file.getvalue() if hasattr(file, "getvalue") else file.read()
+            try:
+                result = _get_pdf_pool(self.pdf_workers).submit(
+                    _parse_in_worker, method, source, self.max_pdf_pages).result()
+            except Exception:
+                return None
+            if result and key is not None:
+                self.cache.put(key, result)
+        
+        if isinstance(result, list):
+            result = "\n".join(page for page in result if page).strip()
+        return result
+    
+    def load_multiple_files(self, files):
+        """Load multiple files concurrently and combine text in upload order
+
+        PDF, DOCX and PPTX parsing runs in the worker process pool; the threads
+        only read files and wait, so parsing isn't serialised by the GIL.
+        """
+        if not files:
+            return ""
+        
+        workers = min(len(files), _env_int("LOAD_WORKERS", 8))
+        ctx = get_script_run_ctx()
+        
+        def attach_ctx():
+            # Lets the loaders' own st.error/st.warning calls reach the page from worker threads
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+        
+        texts = [""] * len(files)
+        timings = []
+        progress = st.progress(0.0, text=f"Processing {len(files)} files...")
+        
+        with ThreadPoolExecutor(max_workers=workers, initializer=attach_ctx) as pool:
+            futures = {pool.submit(self._load_one, file): i for i, file in enumerate(files)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    texts[i], elapsed = future.result()
+                except Exception as e:
+                    st.error(f"Error processing {files[i].name}: {e}")
+                    continue
+                timings.append((files[i].name, elapsed))
+                progress.progress(done / len(files), text=f"Processed {files[i].name} ({elapsed:.1f}s) - {done}/{len(files)}")
+        
+        progress.empty()
+        if timings:
+            slowest = max(timings, key=lambda t: t[1])
+            st.caption(f"⏱️ Loaded {len(timings)} files; slowest: {slowest[0]} ({slowest[1]:.1f}s)")
         
-        return combined_text.strip()
\ No newline at end of file
+        parts = [f"--- Content from {file.name} ---\n\n{text}" for file, text in zip(files, texts) if text]
+        return "\n\n".join(parts)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+
+# HTTP statuses worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                   "DeadlineExceeded", "GatewayTimeout", "TimeoutError"}
+
+# Gemini's 429 message suggests a wait, e.g. "Please retry in 23.5s"
+RETRY_AFTER_RE = re.compile(r"retry in ([0-9.]+)\s*s", re.IGNORECASE)
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at per_minute / 60 per second
+
+    Must be used from a single event loop (the client's background loop).
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available and take them (amounts above capacity take it all)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float):
+        """Charge (positive) or refund (negative) tokens once the real usage is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def _is_retryable(error) -> bool:
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    return code in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_NAMES
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class AsyncGeminiClient:
+    """Rate-limited asyncio wrapper around a google.generativeai GenerativeModel
+
+    All requests run on one background event loop shared by every session, so the
+    concurrency semaphore and the RPM / TPM buckets are process-wide. Retryable
+    errors (429, 5xx, timeouts) are retried with full-jitter exponential backoff,
+    honouring the wait Gemini suggests on 429s.
+    """
+
+    def __init__(self, model, rpm=None, tpm=None, concurrency=None, max_retries=None,
+                 base_delay=1.0, max_delay=60.0):
+        self.model = model
+        self.rpm = TokenBucket(rpm or int(os.getenv("GEMINI_RPM", "15")))
+        self.tpm = TokenBucket(tpm or int(os.getenv("GEMINI_TPM", "1000000")))
+        self.concurrency = concurrency or int(os.getenv("GEMINI_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _backoff(self, attempt, error) -> float:
+        match = RETRY_AFTER_RE.search(str(error))
+        if match:
+            return min(self.max_delay, float(match.group(1))) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _generate(self, prompt, max_tokens, temperature) -> str:
+        """Runs on the client's loop: wait for rate-limit capacity, call Gemini, retry transient failures"""
+        import google.generativeai as genai
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        config = genai.types.GenerationConfig(max_output_tokens=max_tokens, temperature=temperature)
+        estimate = estimate_tokens(prompt) + max_tokens
+
+        attempt = 0
+        while True:
+            await self.rpm.acquire(1)
+            await self.tpm.acquire(estimate)
+            try:
+                async with self._semaphore:
+                    response = await self.model.generate_content_async(prompt, generation_config=config)
+            except Exception as e:
+                # the request never ran, so give its token estimate back
+                self.tpm.adjust(-estimate)
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+                continue
+
+            usage = getattr(response, "usage_metadata", None)
+            used = getattr(usage, "total_token_count", 0) if usage is not None else 0
+            if used:
+                self.tpm.adjust(used - estimate)
+            return response.text
+
+    # ---------- sync wrapper ----------
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True).start()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the client's loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+
+    async def generate(self, prompt, max_tokens=2048, temperature=0.7) -> str:
+        """Generate text; awaitable from any event loop (the request itself runs on the client's loop)"""
+        return await asyncio.wrap_future(self.submit(self._generate(prompt, max_tokens, temperature)))
+
+    def generate_sync(self, prompt, max_tokens=2048, temperature=0.7) -> str:
+        """Blocking generate() for Streamlit callbacks and other synchronous code"""
+        return self.submit(self._generate(prompt, max_tokens, temperature)).result()
@@ -1,14 +1,45 @@
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
-from youtube_transcript_api import YouTubeTranscriptApi
-from langdetect import detect
 import re
-from PIL import Image
-import pytesseract
+import threading
+from modules.gemini_client import AsyncGeminiClient
+from modules.ocr_engine import get_ocr_engine
+
+# google.generativeai, bs4, youtube_transcript_api and langdetect are imported where they are
+# used, so rendering the upload page doesn't pay for them
+
+# Use the CORRECT model name for free tier
+GEMINI_MODEL = "models/gemini-flash-latest"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_gemini_model(api_key):
+    """Process-wide Gemini client shared by every session"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _model = genai.GenerativeModel(GEMINI_MODEL)
+        return _model
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client(api_key) -> AsyncGeminiClient:
+    """Process-wide rate-limited client, so RPM/TPM limits hold across every session"""
+    global _client
+    model = get_gemini_model(api_key)
+    with _client_lock:
+        if _client is None:
+            _client = AsyncGeminiClient(model)
+        return _client
 
 class GeminiProcessor:
     def __init__(self):
@@ -18,26 +49,22 @@ class GeminiProcessor:
         if not self.api_key:
             raise ValueError("⚠️ GEMINI_API_KEY not found in .env file")
         
-        genai.configure(api_key=self.api_key)
-        # Use the CORRECT model name for free tier
-        self.model = genai.GenerativeModel("models/gemini-flash-latest")
+        self.model = get_gemini_model(self.api_key)
+        self.client = get_gemini_client(self.api_key)
 
     
     def generate(self, prompt, max_tokens=2048):
-        """Generate content using Gemini"""
+        """Generate content using Gemini (rate-limited, with retries on 429s and server errors)"""
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=max_tokens,
-                    temperature=0.7,
-                )
-            )
-            return response.text
+            return self.client.generate_sync(prompt, max_tokens=max_tokens, temperature=0.7)
         except Exception as e:
             st.error(f"Gemini API Error: {e}")
             return f"Error generating response: {e}"
     
+    async def generate_async(self, prompt, max_tokens=2048):
+        """Awaitable generate() for batch jobs that fan out many prompts; errors propagate"""
+        return await self.client.generate(prompt, max_tokens=max_tokens, temperature=0.7)
+    
     @st.cache_data(ttl=3600)
     def generate_summary(_self, text, style="concise", length=150):
         """Generate summary with caching"""
@@ -105,17 +132,12 @@ Provide a clear, educational answer:"""
         
         return self.generate(prompt, max_tokens=1024)
     
-    def explain_image_with_ocr(self, image_file):
+    def explain_image_with_ocr(self, image_file, extracted_text=None):
         """Extract text from image using OCR then explain with AI"""
         try:
-            # Reset file pointer
-            image_file.seek(0)
-            
-            # Load image
-            img = Image.open(image_file)
-            
-            # Extract text using OCR
-            extracted_text = pytesseract.image_to_string(img)
+            # Extract text using the shared batch OCR engine (cached by image hash)
+            if extracted_text is None:
+                extracted_text = get_ocr_engine().extract_text(image_file)
             
             if not extracted_text.strip():
                 return "⚠️ No text detected in image. The image might be purely visual or the text is unclear."
@@ -142,6 +164,17 @@ Be thorough and educational."""
             st.error(f"Image analysis error: {e}")
             return f"Unable to analyze image: {str(e)}"
     
+    def explain_images_with_ocr(self, image_files):
+        """OCR a batch of images in parallel, then explain each one"""
+        try:
+            texts = get_ocr_engine().extract_many(image_files)
+        except Exception as e:
+            st.error(f"Image analysis error: {e}")
+            return {f.name: f"Unable to analyze image: {str(e)}" for f in image_files}
+        
+        return {f.name: self.explain_image_with_ocr(f, extracted_text=text)
+                for f, text in zip(image_files, texts)}
+    
     def analyze_url(self, url: str):
         """Analyze YouTube video or website URL"""
         try:
@@ -175,6 +208,9 @@ Be thorough and educational."""
             if not video_id:
                 return "⚠️ Invalid YouTube URL"
             
+            from youtube_transcript_api import YouTubeTranscriptApi
+            from langdetect import detect
+            
             # Get transcript
             transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
             transcript_text = " ".join([t['text'] for t in transcript_list])
@@ -224,6 +260,7 @@ Format:
             response.raise_for_status()
             
             # Parse HTML
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(response.content, 'html.parser')
             
             # Extract title
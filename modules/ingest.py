@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from modules.utils import clean_extracted_text
+
+# Sentinel marking the end of a stage's output
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception from a stage thread to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _threaded(iterable, maxsize, stop):
+    """Run an iterable in a background thread, handing items over through a bounded queue"""
+    q = queue.Queue(maxsize=maxsize)
+
+    def put(item):
+        # Poll so the producer notices when the consumer has given up
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_StageError(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=run, daemon=True)
+    # Lets st.error/st.info from the loaders in this stage reach the page, as in load_multiple_files
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+    thread.start()
+
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def _batched(items, size):
+    """Group an iterator into lists of at most `size` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestPipeline:
+    """Streaming extract -> clean -> chunk -> embed -> add pipeline with bounded stage queues"""
+
+    def __init__(self, loader, vector_store, queue_size=8, batch_size=32):
+        self.loader = loader
+        self.vector_store = vector_store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+
+    def run(self, uploaded_file, source):
+        """Ingest one file, making each batch searchable as soon as it is stored"""
+        stop = threading.Event()
+        start = time.time()
+        try:
+            pages = _threaded(self.loader.iter_pages(uploaded_file), self.queue_size, stop)
+            cleaned = _threaded((clean_extracted_text(p) for p in pages), self.queue_size, stop)
+            chunks = self.vector_store.chunk_stream(cleaned, source)
+            # With EMBED_PROCESSES > 1, batches must be large enough for the engine to use its process pool
+            batch_size = max(self.batch_size, getattr(self.vector_store.embedding_function, "pool_batch", 0))
+            batches = _threaded(_batched(chunks, batch_size), self.queue_size, stop)
+            embedded = _threaded(
+                ((batch, self.vector_store.embed([chunk.text for chunk in batch])) for batch in batches),
+                self.queue_size,
+                stop
+            )
+
+            status = st.empty()
+            added = 0
+            written = set()
+            for batch, embeddings in embedded:
+                written.update(self.vector_store.add_chunk_batch([chunk.text for chunk in batch], source,
+                                                                 start_index=added, embeddings=embeddings))
+                added += len(batch)
+                status.caption(f"📥 {added} chunks indexed from {uploaded_file.name}...")
+            status.empty()
+
+            # Chunks from an earlier version of this source that no longer occur
+            if written:
+                self.vector_store.prune_source(source, written)
+
+            return added, time.time() - start
+        finally:
+            stop.set()
@@ -1,8 +1,7 @@
 # modules/ocr_audio.py
-import pytesseract
-from PIL import Image
 import pyttsx3
 from modules.text_processing import GeminiProcessor
+from modules.ocr_engine import get_ocr_engine
 
 class OCRAudioProcessor:
     def __init__(self):
@@ -14,8 +13,7 @@ class OCRAudioProcessor:
     # Extract text from image
     def extract_text_from_image(self, file_path: str) -> str:
         try:
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
+            text = get_ocr_engine().extract_text(file_path)
 
             if text.strip():
                 # Use AI to explain the image content
@@ -27,6 +25,14 @@ class OCRAudioProcessor:
         except Exception as e:
             return f"OCR error: {str(e)}"
 
+    # -----------------
+    # Extract text from many images at once
+    def extract_texts_from_images(self, file_paths) -> list:
+        try:
+            return get_ocr_engine().extract_many(file_paths)
+        except Exception as e:
+            return [f"OCR error: {str(e)}"] * len(file_paths)
+
     # -----------------
     # Text-to-Speech
     def text_to_speech(self, text: str):
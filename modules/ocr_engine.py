@@ -0,0 +1,164 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# With tesserocr, images taller than this are OCR'd as horizontal bands in parallel
+TILE_HEIGHT = 2000
+# Each band is cut at the emptiest row in its last quarter, so text lines are never split
+# (bands don't overlap, so no line is read twice)
+TILE_SEAM_SEARCH = TILE_HEIGHT // 4
+
+
+class BatchOCREngine:
+    """Parallel OCR over many images with a pool of long-lived workers and a result cache
+
+    Each worker thread keeps its own tesserocr API handle when tesserocr is installed,
+    so the language model is loaded once per worker instead of once per image.
+    Without tesserocr every image costs one pytesseract subprocess, so big images
+    are not tiled (that would only start more processes); images still run in parallel.
+    """
+
+    def __init__(self, workers=None, lang="eng", cache_size=512, preset=None):
+        # PIL / numpy / pytesseract are imported here rather than at module import, which keeps app startup light
+        from modules.ocr_preprocess import PRESETS
+
+        self.workers = workers or int(os.getenv("OCR_WORKERS", os.cpu_count() or 2))
+        self.lang = lang
+        self.preset = preset or os.getenv("OCR_PRESET", "balanced")
+        if self.preset not in PRESETS:
+            raise ValueError(f"Unknown OCR preset '{self.preset}'. Choose from: {', '.join(PRESETS)}")
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+
+        tesseract_cmd = os.getenv("TESSERACT_CMD")
+        if tesseract_cmd:
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+        try:
+            import tesserocr
+            self._tesserocr = tesserocr
+        except ImportError:
+            self._tesserocr = None
+
+    # ---------- cache ----------
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _cache_put(self, key, text):
+        with self._cache_lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _read_bytes(image):
+        """Raw bytes of an uploaded file, path or file-like object"""
+        if isinstance(image, (str, os.PathLike)):
+            with open(image, "rb") as f:
+                return f.read()
+        image.seek(0)
+        data = image.read()
+        image.seek(0)
+        return data
+
+    def image_key(self, data: bytes) -> str:
+        return hashlib.sha256(data + f"|{self.lang}|{self.preset}".encode()).hexdigest()
+
+    # ---------- recognition ----------
+
+    def _recognize(self, img):
+        """OCR one PIL image on the current worker thread"""
+        if self._tesserocr is not None:
+            api = getattr(self._local, "api", None)
+            if api is None:
+                api = self._tesserocr.PyTessBaseAPI(lang=self.lang)
+                self._local.api = api
+            api.SetImage(img)
+            return api.GetUTF8Text()
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=self.lang)
+
+    def _tiles(self, img):
+        """Split tall images into bands at blank rows so big scans use several workers"""
+        if self._tesserocr is None or img.height <= TILE_HEIGHT:
+            return [img]
+        import numpy as np
+
+        # Row projection of ink edges: blank rows (of any background colour) have none
+        pixels = np.asarray(img.convert("L"), dtype=np.int16)
+        ink = (np.abs(np.diff(pixels, axis=1)) > 64).sum(axis=1)
+        # Smoothing makes the minimum land in the middle of a gap between lines rather than at its edge
+        ink = np.convolve(ink, np.ones(9), mode="same")
+
+        cuts = [0]
+        while img.height - cuts[-1] > TILE_HEIGHT:
+            end = cuts[-1] + TILE_HEIGHT
+            start = end - TILE_SEAM_SEARCH
+            cuts.append(start + int(np.argmin(ink[start:end])))
+        cuts.append(img.height)
+        return [img.crop((0, top, img.width, bottom)) for top, bottom in zip(cuts, cuts[1:])]
+
+    def _load(self, data):
+        from PIL import Image
+        from modules.ocr_preprocess import preprocess_image
+
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return preprocess_image(img, self.preset)
+
+    def extract_text(self, image) -> str:
+        """OCR a single image (path or file-like), using the cache when possible"""
+        return self.extract_many([image])[0]
+
+    def extract_many(self, images) -> list:
+        """OCR many images in parallel; results come back in input order"""
+        payloads = [self._read_bytes(image) for image in images]
+        keys = [self.image_key(data) for data in payloads]
+
+        results = [self._cache_get(key) for key in keys]
+        # Identical images in one batch are recognised once
+        misses = {}
+        for result, key, data in zip(results, keys, payloads):
+            if result is None and key not in misses:
+                misses[key] = data
+
+        # Decode + preprocess in the pool, then fan the tiles of every image out side by side
+        prepared = dict(zip(misses, self._pool.map(self._load, misses.values())))
+        pending = {key: [self._pool.submit(self._recognize, tile) for tile in self._tiles(img)]
+                   for key, img in prepared.items()}
+
+        fresh = {}
+        for key, futures in pending.items():
+            if len(futures) == 1:
+                fresh[key] = futures[0].result()
+            else:
+                fresh[key] = "\n".join(f.result().strip() for f in futures)
+            self._cache_put(key, fresh[key])
+
+        return [result if result is not None else fresh[key] for result, key in zip(results, keys)]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> BatchOCREngine:
+    """Process-wide OCR engine shared by every session"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BatchOCREngine()
+        return _engine
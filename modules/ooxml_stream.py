@@ -0,0 +1,140 @@
+"""Streaming text extraction for DOCX/PPTX straight from the OOXML zip parts
+
+The parts are decompressed and parsed incrementally with iterparse and every
+element is cleared once consumed, so memory stays flat on very large files and
+no python-docx / python-pptx object model is built.
+"""
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+NOTES_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+
+def _iter_text_blocks(stream, ns, include=None):
+    """Yield paragraph and table-row strings from a DrawingML/WordprocessingML part
+
+    Paragraphs inside table cells are folded into their cell, and each table row
+    is yielded as "cell | cell | cell". `include` can veto paragraphs (used for notes).
+    """
+    para, cells, rows = [], [], []
+    cell_depth = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == ns + "tc":
+                cell_depth += 1
+                cells.append([])
+            elif tag == ns + "tr":
+                rows.append([])
+            continue
+
+        if tag == ns + "t":
+            para.append(elem.text or "")
+        elif tag == ns + "tab":
+            para.append("\t")
+        elif tag in (ns + "br", ns + "cr"):
+            para.append("\n")
+        elif tag == ns + "p":
+            text = "".join(para).strip()
+            para = []
+            if text and (include is None or include(elem)):
+                if cell_depth:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elem.clear()
+        elif tag == ns + "tc":
+            cell_depth -= 1
+            text = " ".join(cells.pop())
+            if rows:
+                rows[-1].append(text)
+            elem.clear()
+        elif tag == ns + "tr":
+            row = [c for c in rows.pop() if c]
+            if row:
+                line = " | ".join(row)
+                if cell_depth:
+                    cells[-1].append(line)  # nested table: fold the row into the outer cell
+                else:
+                    yield line
+            elem.clear()
+
+
+def iter_docx_sections(file):
+    """Yield DOCX body text paragraph by paragraph, with table rows as 'a | b | c'"""
+    with zipfile.ZipFile(file) as zf:
+        with zf.open("word/document.xml") as part:
+            yield from _iter_text_blocks(part, W)
+
+
+def _read_rels(zf, part_name):
+    """Map relationship id -> (type, absolute part name) for a part"""
+    rels_name = posixpath.join(posixpath.dirname(part_name), "_rels", posixpath.basename(part_name) + ".rels")
+    try:
+        with zf.open(rels_name) as f:
+            root = ET.parse(f).getroot()
+    except KeyError:
+        return {}
+    base = posixpath.dirname(part_name)
+    return {
+        rel.get("Id"): (rel.get("Type"), posixpath.normpath(posixpath.join(base, rel.get("Target"))))
+        for rel in root.iter(PKG_REL + "Relationship")
+    }
+
+
+def _slide_parts(zf):
+    """Slide part names in presentation order"""
+    rels = _read_rels(zf, "ppt/presentation.xml")
+    with zf.open("ppt/presentation.xml") as f:
+        root = ET.parse(f).getroot()
+    slides = []
+    for sld_id in root.iter(P + "sldId"):
+        rel = rels.get(sld_id.get(R + "id"))
+        if rel:
+            slides.append(rel[1])
+    if slides:
+        return slides
+    # No slide list: fall back to numeric file order
+    names = [n for n in zf.namelist() if re.match(r"ppt/slides/slide\d+\.xml$", n)]
+    return sorted(names, key=lambda n: int(re.search(r"(\d+)\.xml$", n).group(1)))
+
+
+def _iter_notes(stream):
+    """Speaker-note paragraphs only (skips slide number / slide image placeholders)"""
+    shape_is_body = False
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start" and elem.tag == P + "sp":
+            shape_is_body = False
+        elif event == "start" and elem.tag == P + "ph":
+            shape_is_body = elem.get("type") == "body"
+        elif event == "end" and elem.tag == A + "p" and shape_is_body:
+            text = "".join(t.text or "" for t in elem.iter(A + "t")).strip()
+            if text:
+                yield text
+            elem.clear()
+
+
+def iter_pptx_slides(file):
+    """Yield one text block per slide: shapes, grouped shapes, tables and speaker notes"""
+    with zipfile.ZipFile(file) as zf:
+        for number, slide in enumerate(_slide_parts(zf), 1):
+            with zf.open(slide) as part:
+                lines = list(_iter_text_blocks(part, A))
+
+            for rel_type, target in _read_rels(zf, slide).values():
+                if rel_type == NOTES_REL_TYPE:
+                    with zf.open(target) as notes:
+                        notes_lines = list(_iter_notes(notes))
+                    if notes_lines:
+                        lines.append("Speaker notes: " + " ".join(notes_lines))
+
+            if lines:
+                yield "\n".join(lines)
@@ -0,0 +1,213 @@
+import os
+import tempfile
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.vector_backends import RowStoreMixin, VectorBackend
+
+DTYPES = ("float16", "int8")
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class QuantizedIndex(RowStoreMixin, VectorBackend):
+    """Exact-scan vector index storing embeddings as float16 or scalar-quantized int8
+
+    int8 rows use a per-vector symmetric scale (max |x| / 127). The float32
+    originals can be kept in an on-disk memmap so the top candidates of each
+    scan are re-scored at full precision without holding them in RAM.
+    """
+
+    def __init__(self, dim: int = 384, dtype: str = "int8", rescore: bool = True,
+                 rescore_factor: int = 4, spill_dir: Optional[str] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'. Choose from: {', '.join(DTYPES)}")
+        self.dim = dim
+        self.dtype = dtype
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.spill_dir = spill_dir
+        self._lock = threading.RLock()
+        self._remove_full_file = None
+        self._reset()
+
+    def _reset(self):
+        self.codes = np.zeros((0, self.dim), dtype=np.int8 if self.dtype == "int8" else np.float16)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._rows: Dict[str, int] = {}
+        self._hash_rows: Dict[str, int] = {}
+        self._full = None
+        self._full_file = None
+        self._size = 0
+
+    # ---------- encoding ----------
+
+    def _encode(self, vectors: np.ndarray):
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _decode(self, rows):
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None]
+
+    def _grow_full(self, needed):
+        """Keep float32 originals in a memmap that grows by doubling"""
+        capacity = 0 if self._full is None else self._full.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        if self._full_file is None:
+            fd, self._full_file = tempfile.mkstemp(prefix="studysphere_vectors_", suffix=".f32", dir=self.spill_dir)
+            os.close(fd)
+            # the spill file goes with the index, even if clear() is never called
+            self._remove_full_file = weakref.finalize(self, _remove_file, self._full_file)
+        if self._full is not None:
+            self._full.flush()
+            del self._full
+        self._full = np.memmap(self._full_file, dtype=np.float32, mode="r+" if capacity else "w+",
+                               shape=(new_capacity, self.dim))
+
+    # ---------- writes ----------
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        codes, scales = self._encode(vectors)
+        with self._lock:
+            new_rows = []
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self.ids) + len(new_rows)
+                    self._rows[doc_id] = row
+                    new_rows.append(i)
+                else:
+                    self.codes[row], self.scales[row] = codes[i], scales[i]
+                    self.documents[row], self.metadatas[row] = documents[i], metadatas[i]
+                    if self._full is not None:
+                        self._full[row] = vectors[i]
+
+            for i, meta in enumerate(metadatas):
+                if meta and meta.get("content_hash"):
+                    self._hash_rows[meta["content_hash"]] = self._rows[ids[i]]
+
+            if new_rows:
+                start = len(self.ids)
+                self.codes = np.concatenate([self.codes, codes[new_rows]])
+                self.scales = np.concatenate([self.scales, scales[new_rows]])
+                self.ids.extend(ids[i] for i in new_rows)
+                self.documents.extend(documents[i] for i in new_rows)
+                self.metadatas.extend(metadatas[i] for i in new_rows)
+                if self.rescore:
+                    self._grow_full(start + len(new_rows))
+                    self._full[start:start + len(new_rows)] = vectors[new_rows]
+
+    def delete(self, ids):
+        with self._lock:
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not drop:
+                return
+            keep = [row for row in range(len(self.ids)) if row not in drop]
+            self.codes = self.codes[keep]
+            self.scales = self.scales[keep]
+            if self._full is not None and keep:
+                # rows only move towards the front, so the memmap is compacted in place
+                self._full[:len(keep)] = np.asarray(self._full[keep])
+            self._keep_rows(keep)
+
+    def clear(self):
+        with self._lock:
+            self._full = None
+            self._reset()
+            if self._remove_full_file is not None:
+                self._remove_full_file()
+                self._remove_full_file = None
+
+    # ---------- reads ----------
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def rows_for_hashes(self, hashes) -> Dict[str, int]:
+        """Row of a stored chunk for each content hash that is present"""
+        with self._lock:
+            return {h: self._hash_rows[h] for h in hashes if h in self._hash_rows}
+
+    def vectors_for(self, rows) -> np.ndarray:
+        """Best available float32 vectors for the given rows"""
+        if self._full is not None:
+            return np.asarray(self._full[rows])
+        return self._decode(rows)
+
+    def _scan(self, q, block=4096):
+        """Approximate scores for every row, decoding a block at a time to cap temporary memory"""
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), block):
+            codes = self.codes[start:start + block].astype(np.float32)
+            scores[start:start + block] = (codes @ q) * self.scales[start:start + block]
+        return scores
+
+    def query(self, embedding, top_k: int):
+        """Top-k rows by cosine similarity: (rows, distances) with distance = 1 - cos"""
+        with self._lock:
+            n = len(self.ids)
+            if n == 0:
+                return [], []
+            q = np.asarray(embedding, dtype=np.float32)
+            q = q / max(np.linalg.norm(q), 1e-12)
+
+            scores = self._scan(q)
+            k = min(top_k, n)
+            pool = min(n, k * self.rescore_factor) if self._full is not None else k
+            candidates = np.argpartition(-scores, pool - 1)[:pool]
+
+            if self._full is not None:
+                full = np.asarray(self._full[candidates])
+                norms = np.maximum(np.linalg.norm(full, axis=1), 1e-12)
+                scores_c = (full @ q) / norms
+            else:
+                norms = np.maximum(np.linalg.norm(self._decode(candidates), axis=1), 1e-12)
+                scores_c = scores[candidates] / norms
+
+            order = np.argsort(-scores_c)[:k]
+            rows = candidates[order]
+            return rows.tolist(), (1.0 - scores_c[order]).tolist()
+
+    def search(self, query_embeddings, top_k):
+        # Rows are only valid until the next delete/upsert, so they are resolved under the same lock
+        with self._lock:
+            results = []
+            for embedding in query_embeddings:
+                rows, distances = self.query(embedding, top_k)
+                results.append([{
+                    'id': self.ids[row],
+                    'content': self.documents[row],
+                    'metadata': self.metadatas[row],
+                    'distance': distance
+                } for row, distance in zip(rows, distances)])
+            return results
+
+    def embeddings_for_hashes(self, hashes):
+        with self._lock:
+            rows = self.rows_for_hashes(hashes)
+            if not rows:
+                return {}
+            vectors = self.vectors_for(list(rows.values()))
+            return {h: vector.tolist() for h, vector in zip(rows, vectors)}
+
+    def memory_bytes(self) -> int:
+        """RAM held by the compact codes (the float32 memmap lives on disk)"""
+        return int(self.codes.nbytes + self.scales.nbytes)
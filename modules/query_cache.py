@@ -0,0 +1,42 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class QueryResultCache:
+    """Thread-safe LRU of search results, valid only for the collection version they were computed at
+
+    Each entry remembers how many results were fetched, so a later request for
+    fewer results is answered by slicing the cached list.
+    """
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int, top_k: int) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            entry_version, fetched, results = entry
+            if entry_version != version:
+                del self._items[key]
+                return None
+            # fewer results than fetched means the collection simply ran out
+            if fetched < top_k and len(results) >= fetched:
+                return None
+            self._items.move_to_end(key)
+            return [dict(r) for r in results[:top_k]]
+
+    def put(self, key: Hashable, version: int, top_k: int, results: List[Dict]):
+        with self._lock:
+            self._items[key] = (version, top_k, [dict(r) for r in results])
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
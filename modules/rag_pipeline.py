@@ -1,34 +1,88 @@
 from modules.file_loader import FileLoader
 from modules.gemini_processor import GeminiProcessor
-from modules.vector_store import VectorStore
+from modules.embedding_engine import get_embedding_engine
+from modules.vector_store import DEFAULT_COLLECTION, EMBEDDING_MODEL, get_vector_store
+from modules.ingest import IngestPipeline
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+import threading
+import os
+
+# Characters of retrieved text given to Gemini per answer (roughly three 500-word passages);
+# self-correction checks the answer against 5/3 of this
+RAG_CONTEXT_CHARS = int(os.getenv("RAG_CONTEXT_CHARS", "9000"))
+
 
 class RAGPipeline:
     """Self-correcting RAG Pipeline"""
     
-    def __init__(self):
+    def __init__(self, collection_name: str = DEFAULT_COLLECTION):
+        # Models and clients behind these are process-wide; only the collection handle is per knowledge base.
+        # Gemini and the vector store are built on first use so the first page renders immediately.
+        self.collection_name = collection_name
         self.loader = FileLoader()
-        self.gemini = GeminiProcessor()
-        self.vector_store = VectorStore()
+        self._gemini = None
+        self._vector_store = None
+        self._ingest = None
+        self._lock = threading.Lock()
+        self._warm_thread = None
+        self.warm_error = None  # set if warm-up fails; KB features then load (and report errors) on first use
+    
+    @property
+    def gemini(self):
+        with self._lock:
+            if self._gemini is None:
+                self._gemini = GeminiProcessor()
+            return self._gemini
+    
+    @property
+    def vector_store(self):
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = get_vector_store(self.collection_name)
+            return self._vector_store
+    
+    @property
+    def ingest(self):
+        vector_store = self.vector_store
+        with self._lock:
+            if self._ingest is None:
+                self._ingest = IngestPipeline(self.loader, vector_store)
+            return self._ingest
+    
+    def warm_up(self):
+        """Load the embedding model on a background thread (returns immediately)
+
+        Only the model is loaded; the knowledge base is opened on first use and
+        its collection is only created by the first document added to it.
+        """
+        with self._lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(target=self._warm_up, name="rag-warmup", daemon=True)
+                add_script_run_ctx(self._warm_thread)
+                self._warm_thread.start()
+    
+    def _warm_up(self):
+        try:
+            engine = get_embedding_engine(EMBEDDING_MODEL)
+            engine.warm_up()
+            self.warm_error = engine.warm_error
+        except Exception as e:
+            self.warm_error = e
+    
+    @property
+    def kb_ready(self) -> bool:
+        """True once the embedding model is loaded"""
+        try:
+            return get_embedding_engine(EMBEDDING_MODEL).ready
+        except ValueError:
+            # bad EMBED_BACKEND; warm_error carries it
+            return False
     
     def process_single_file(self, uploaded_file):
         """Process a single uploaded file"""
         try:
-            file_type = uploaded_file.type
-            
-            if file_type == "application/pdf":
-                return self.loader.load_pdf(uploaded_file)
-            elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                return self.loader.load_docx(uploaded_file)
-            elif file_type == "application/vnd.openxmlformats-officedocument.presentationml.presentation":
-                return self.loader.load_pptx(uploaded_file)
-            elif file_type.startswith("image/"):
-                return self.loader.load_image(uploaded_file)
-            elif file_type == "text/plain":
-                return self.loader.load_txt(uploaded_file)
-            else:
-                st.warning(f"Unsupported file type: {file_type}")
-                return ""
+            return self.loader.load_file(uploaded_file)
         except Exception as e:
             st.error(f"Error processing file: {e}")
             return ""
@@ -49,6 +103,21 @@ class RAGPipeline:
                 st.success(f"✅ Added {num_chunks} chunks to knowledge base")
             return num_chunks
     
+    def ingest_file(self, uploaded_file, source: str = None):
+        """Stream a file straight into the vector store, page by page"""
+        source = source or uploaded_file.name
+        try:
+            with st.spinner("🔄 Streaming pages into the knowledge base..."):
+                num_chunks, elapsed = self.ingest.run(uploaded_file, source)
+            if num_chunks > 0:
+                st.success(f"✅ Added {num_chunks} chunks to knowledge base in {elapsed:.1f}s")
+            else:
+                st.warning("No text chunks created")
+            return num_chunks
+        except Exception as e:
+            st.error(f"Error ingesting {uploaded_file.name}: {e}")
+            return 0
+    
     def get_vectorstore_stats(self):
         """Get vector store statistics"""
         return {
@@ -59,6 +128,14 @@ class RAGPipeline:
         """Clear the vector store"""
         return self.vector_store.clear_collection()
     
+    def list_sources(self):
+        """Chunk count per source document in the knowledge base"""
+        return self.vector_store.list_sources()
+    
+    def delete_source(self, source: str):
+        """Remove one source document from the knowledge base"""
+        return self.vector_store.delete_source(source)
+    
     def rag_query(self, question: str, use_self_correction: bool = True):
         """
         RAG query with optional self-correction
@@ -66,8 +143,10 @@ class RAGPipeline:
         2. Generate initial answer
         3. (Optional) Self-correct based on retrieved context
         """
-        # Step 1: Retrieve relevant context
-        context = self.vector_store.rag_retrieve(question, top_k=3)
+        # Step 1: Retrieve relevant context (one search covers the wider self-correction context too)
+        budgets = [RAG_CONTEXT_CHARS, RAG_CONTEXT_CHARS * 5 // 3] if use_self_correction else [RAG_CONTEXT_CHARS]
+        contexts = self.vector_store.rag_retrieve_many(question, budgets)
+        context = contexts[0]
         
         if not context:
             return "❌ No relevant information found in the knowledge base. Please upload documents first."
@@ -77,16 +156,16 @@ class RAGPipeline:
         
         # Step 3: Self-correction (optional)
         if use_self_correction:
-            # Retrieve more context for verification
-            additional_context = self.vector_store.rag_retrieve(question, top_k=5)
+            # Wider context for verification
+            additional_context = contexts[1]
             refined_answer = self.gemini.refine_answer(question, initial_answer, additional_context)
             return refined_answer
         
         return initial_answer
     
-    def semantic_search(self, query: str, top_k: int = 5):
-        """Perform semantic search and return results"""
-        return self.vector_store.search(query, top_k=top_k)
+    def semantic_search(self, query: str, top_k: int = 5, hybrid: bool = False):
+        """Perform semantic (or hybrid keyword + semantic) search and return results"""
+        return self.vector_store.search(query, top_k=top_k, mode="hybrid" if hybrid else "dense")
     
     def generate_summary(self, text: str, style: str = "concise", length: int = 150):
         """Generate summary using Gemini"""
@@ -0,0 +1,119 @@
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+
+# Uploads at or above this size are spilled to disk before parsing
+DEFAULT_SPILL_THRESHOLD_MB = 20
+
+
+class MappedFile:
+    """Read-only, seekable file view backed by mmap instead of an in-memory buffer"""
+
+    def __init__(self, path, name=None, file_type=None):
+        self.path = os.fspath(path)
+        self.name = name or os.path.basename(self.path)
+        self.type = file_type
+        self._fh = open(self.path, "rb")
+        self.size = os.fstat(self._fh.fileno()).st_size
+        # mmap cannot map an empty file
+        self._mmap = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._pos = 0
+
+    def read(self, size=-1):
+        if self._mmap is None:
+            return b""
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        data = self._mmap[self._pos:end]
+        self._pos = end
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def getbuffer(self):
+        """Zero-copy view of the whole file (used for hashing)"""
+        return memoryview(self._mmap if self._mmap is not None else b"")
+
+    def getvalue(self):
+        return self._mmap[:] if self._mmap is not None else b""
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SpooledUpload(MappedFile):
+    """An upload copied once to a temp file; the temp file is removed with the object"""
+
+    def __init__(self, uploaded_file, spill_dir=None):
+        suffix = os.path.splitext(uploaded_file.name)[1]
+        fd, path = tempfile.mkstemp(prefix="studysphere_", suffix=suffix, dir=spill_dir)
+        with os.fdopen(fd, "wb") as out:
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, out, 1024 * 1024)
+
+        super().__init__(path, name=uploaded_file.name, file_type=uploaded_file.type)
+        self._cleanup = weakref.finalize(self, _remove_spill, self._mmap, self._fh, path)
+
+    def close(self):
+        self._cleanup()
+
+
+def _remove_spill(mapped, fh, path):
+    try:
+        if mapped is not None and not mapped.closed:
+            mapped.close()
+        fh.close()
+        os.remove(path)
+    except (OSError, BufferError):
+        pass
+
+
+def open_source(file):
+    """Accept a path, an mmap or a file-like object and return a seekable file object, rewound
+
+    Uploads are read more than once per script run (preview, then "Add to KB"),
+    so every loader must start from the beginning rather than wherever the last reader stopped.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        return MappedFile(file)
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file
+
+
+def spill_upload(uploaded_file, threshold_mb=None):
+    """Spill large uploads to disk and release their in-memory buffer; small ones pass through"""
+    if threshold_mb is None:
+        threshold_mb = float(os.getenv("SPILL_THRESHOLD_MB", DEFAULT_SPILL_THRESHOLD_MB))
+    if uploaded_file.type.startswith("image/") or uploaded_file.size < threshold_mb * 1024 * 1024:
+        return uploaded_file
+
+    spooled = SpooledUpload(uploaded_file, spill_dir=os.getenv("SPILL_DIR") or None)
+    # Parsers only ever see the mapped copy from here on
+    uploaded_file.close()
+    return spooled
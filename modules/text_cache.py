@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+# Bump when extraction output changes so stale entries stop matching
+LOADER_VERSION = "3"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "studysphere", "text")
+
+
+class TextCache:
+    """Content-addressed on-disk cache of extracted document text with LRU eviction"""
+
+    def __init__(self, cache_dir=None, max_mb=None):
+        self.cache_dir = cache_dir or os.getenv("TEXT_CACHE_DIR") or DEFAULT_CACHE_DIR
+        max_mb = max_mb if max_mb is not None else float(os.getenv("TEXT_CACHE_MAX_MB", "256"))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, file, *parts) -> str:
+        """SHA-256 of the file bytes plus loader version and any loader options"""
+        digest = hashlib.sha256()
+        if hasattr(file, "getbuffer"):
+            with file.getbuffer() as view:
+                digest.update(view)
+        else:
+            pos = file.tell()
+            file.seek(0)
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+            file.seek(pos)
+        digest.update(f"|{LOADER_VERSION}|{'|'.join(str(p) for p in parts)}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def get(self, key):
+        """Return the cached value or None; a hit marks the entry as recently used"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serialisable value and evict old entries past the size budget"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".json.gz"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
@@ -1,5 +1,4 @@
 import streamlit as st
-from gtts import gTTS
 import io
 import time
 import requests
@@ -23,7 +22,8 @@ class TTSManager:
             # Limit text length for faster processing
             text_to_speak = text[:1000] if len(text) > 1000 else text
 
-            # Create audio using gTTS
+            # Create audio using gTTS (imported on first use to keep app startup light)
+            from gtts import gTTS
             tts = gTTS(text=text_to_speak, lang=lang, slow=False)
             audio_bytes = io.BytesIO()
             tts.write_to_fp(audio_bytes)
@@ -0,0 +1,480 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from typing import Dict, List, Tuple
+
+import numpy as np
+import streamlit as st
+
+
+class VectorBackend:
+    """Storage and nearest-neighbour search behind VectorStore
+
+    Backends receive precomputed embeddings; VectorStore owns chunking and the
+    embedding model. search() returns one list of result dicts per query, in the
+    {'content', 'metadata', 'distance'} shape used throughout the app.
+    """
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def search(self, query_embeddings, top_k: int) -> List[List[Dict]]:
+        raise NotImplementedError
+
+    def embeddings_for_hashes(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors of chunks whose content hash is in `hashes`"""
+        return {}
+
+    def get(self, ids: List[str]) -> List[Dict]:
+        """Result dicts (distance None) for the given chunk ids, skipping unknown ones"""
+        raise NotImplementedError
+
+    def all_documents(self) -> List[Tuple[str, str]]:
+        """(id, text) of every stored chunk, used to rebuild in-process indexes"""
+        raise NotImplementedError
+
+    def all_metadatas(self) -> List[Tuple[str, Dict]]:
+        """(id, metadata) of every stored chunk, used to rebuild the per-source index"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        """Remove the given chunks; unknown ids are ignored"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class RowStoreMixin:
+    """get/all_documents for backends that keep ids/documents/metadatas as parallel lists"""
+
+    def get(self, ids):
+        with self._lock:
+            return [{
+                'id': doc_id,
+                'content': self.documents[self._rows[doc_id]],
+                'metadata': self.metadatas[self._rows[doc_id]],
+                'distance': None
+            } for doc_id in ids if doc_id in self._rows]
+
+    def all_documents(self):
+        with self._lock:
+            return list(zip(self.ids, self.documents))
+
+    def all_metadatas(self):
+        with self._lock:
+            return list(zip(self.ids, self.metadatas))
+
+    def _keep_rows(self, keep):
+        """Compact the row lists down to `keep` (ascending row numbers), renumbering rows"""
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._hash_rows = {
+            meta["content_hash"]: row
+            for row, meta in enumerate(self.metadatas)
+            if meta and meta.get("content_hash")
+        }
+
+
+# Chroma collection settings; only honoured when a collection is created
+HNSW_KEYS = {
+    "space": "hnsw:space",
+    "M": "hnsw:M",
+    "construction_ef": "hnsw:construction_ef",
+    "search_ef": "hnsw:search_ef",
+}
+
+
+# What Chroma uses for a key absent from a collection's metadata
+HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def hnsw_metadata(space=None, M=None, construction_ef=None, search_ef=None):
+    """Collection metadata for the given HNSW settings (None = Chroma's default)"""
+    values = {"space": space, "M": M, "construction_ef": construction_ef, "search_ef": search_ef}
+    return {HNSW_KEYS[k]: v for k, v in values.items() if v is not None}
+
+
+_chroma_clients = {}
+_chroma_lock = threading.Lock()
+
+
+def get_chroma_client(persist_dir=None):
+    """Process-wide Chroma client per storage location (None = in-memory)"""
+    with _chroma_lock:
+        client = _chroma_clients.get(persist_dir)
+        if client is None:
+            import chromadb
+
+            if persist_dir:
+                os.makedirs(persist_dir, exist_ok=True)
+                client = chromadb.PersistentClient(path=persist_dir)
+            else:
+                client = chromadb.Client()
+            _chroma_clients[persist_dir] = client
+        return client
+
+
+def _drop_collection(client, name):
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB collection (in-memory, or on disk when persist_dir is given)
+
+    hnsw takes hnsw_metadata() keys (metric, M, construction/search ef). They are
+    fixed when a collection is created; an existing collection keeps its own.
+    The collection is only created by the first write and is dropped again once
+    it is emptied, so opening a knowledge base that is never used leaves nothing
+    behind. The client is shared process-wide; an in-memory collection is dropped
+    once its backend is garbage-collected.
+    """
+
+    def __init__(self, name, embedding_function, metadata, persist_dir=None, hnsw=None):
+        self.embedding_function = embedding_function
+        self.metadata = metadata
+        self.hnsw = hnsw or {}
+        self.client = get_chroma_client(persist_dir)
+        self.name = name
+        # Serialises use of self.collection with writes and clear(), which create and drop it
+        self._lock = threading.RLock()
+        self.collection = self._open_collection(name)
+        if not persist_dir:
+            weakref.finalize(self, _drop_collection, self.client, name)
+
+    def _open_collection(self, name):
+        """Existing compatible collection, or None (dropping one whose schema or model changed)"""
+        try:
+            collection = self.client.get_collection(
+                name=name,
+                embedding_function=self.embedding_function
+            )
+        except Exception:
+            return None
+
+        metadata = collection.metadata or {}
+        if all(metadata.get(k) == v for k, v in self.metadata.items()):
+            # A collection created without a setting runs with Chroma's default for it
+            changed = [k for k, v in self.hnsw.items() if metadata.get(k, HNSW_DEFAULTS.get(k)) != v]
+            if changed:
+                st.info(f"Knowledge base '{name}' keeps its existing index settings ({', '.join(changed)}); "
+                        "clear it to rebuild with the new ones.")
+            return collection
+
+        st.warning(
+            f"Knowledge base '{name}' was built with {metadata.get('embedding_model', 'an older setup')} "
+            f"(schema {metadata.get('schema_version', '?')}); rebuilding it empty."
+        )
+        self.client.delete_collection(name)
+        return None
+
+    def _create_collection(self, name):
+        return self.client.create_collection(
+            name=name,
+            embedding_function=self.embedding_function,
+            metadata={**self.metadata, **self.hnsw}
+        )
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        with self._lock:
+            if self.collection is None:
+                self.collection = self._create_collection(self.name)
+            self.collection.upsert(
+                documents=documents,
+                ids=ids,
+                metadatas=metadatas,
+                embeddings=[list(map(float, e)) for e in embeddings]
+            )
+
+    def search(self, query_embeddings, top_k):
+        with self._lock:
+            if self.collection is None:
+                return [[] for _ in query_embeddings]
+            results = self.collection.query(
+                query_embeddings=[list(map(float, q)) for q in query_embeddings],
+                n_results=top_k
+            )
+        formatted = []
+        for q in range(len(query_embeddings)):
+            documents = results['documents'][q] if results['documents'] else []
+            formatted.append([{
+                'id': results['ids'][q][i],
+                'content': doc,
+                'metadata': results['metadatas'][q][i] if results['metadatas'] else {},
+                'distance': results['distances'][q][i] if results['distances'] else 0
+            } for i, doc in enumerate(documents)])
+        return formatted
+
+    def _get(self, **kwargs):
+        """collection.get(), or an empty result while the collection doesn't exist"""
+        with self._lock:
+            if self.collection is None:
+                return {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+            return self.collection.get(**kwargs)
+
+    def embeddings_for_hashes(self, hashes):
+        try:
+            result = self._get(
+                where={"content_hash": {"$in": hashes}},
+                include=["embeddings", "metadatas"]
+            )
+        except Exception:
+            return {}
+        return {
+            meta["content_hash"]: embedding
+            for meta, embedding in zip(result.get("metadatas") or [], result.get("embeddings") or [])
+            if meta and embedding is not None
+        }
+
+    def get(self, ids):
+        result = self._get(ids=list(ids), include=["documents", "metadatas"])
+        found = {
+            doc_id: {'id': doc_id, 'content': doc, 'metadata': meta or {}, 'distance': None}
+            for doc_id, doc, meta in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def all_documents(self):
+        result = self._get(include=["documents"])
+        return list(zip(result["ids"], result["documents"]))
+
+    def all_metadatas(self):
+        result = self._get(include=["metadatas"])
+        return [(doc_id, meta or {}) for doc_id, meta in zip(result["ids"], result["metadatas"])]
+
+    def delete(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            if self.collection is None:
+                return
+            self.collection.delete(ids=list(ids))
+            if self.collection.count() == 0:
+                self.clear()
+
+    def count(self):
+        with self._lock:
+            return self.collection.count() if self.collection is not None else 0
+
+    def clear(self):
+        # Drop the collection; the next write creates a fresh one with the current settings
+        with self._lock:
+            if self.collection is not None:
+                self.client.delete_collection(self.name)
+                self.collection = None
+
+
+class NumpyFlatBackend(RowStoreMixin, VectorBackend):
+    """Exact dot-product scan over a memory-mapped float32 matrix
+
+    Vectors are L2-normalised on insert, so scores are cosine similarities and
+    distance = 1 - cos. The matrix grows append-only (capacity doubling); chunk
+    text and metadata go to an append-only JSONL log replayed on open, where the
+    last record for an id wins. The index directory is only created by the first
+    write and is removed again once the index is emptied.
+    """
+
+    def __init__(self, path=None, dim=384, metadata=None):
+        self.dim = dim
+        self.metadata = dict(metadata or {}, dim=dim)
+        self._temporary = path is None
+        self.path = path or tempfile.mkdtemp(prefix="studysphere_flat_")
+        self._lock = threading.RLock()
+        self._open()
+        if self._temporary:
+            weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    # ---------- files ----------
+
+    @property
+    def _vectors_file(self):
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _log_file(self):
+        return os.path.join(self.path, "chunks.jsonl")
+
+    @property
+    def _meta_file(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _open(self):
+        self._reset()
+        stored = None
+        if os.path.exists(self._meta_file):
+            with open(self._meta_file, encoding="utf-8") as f:
+                stored = json.load(f)
+        if stored is not None and any(stored.get(k) != v for k, v in self.metadata.items()):
+            st.warning(
+                f"Vector index at {self.path} was built with {stored.get('embedding_model', 'an older setup')}; "
+                "rebuilding it empty."
+            )
+            self._wipe()
+            return
+        if stored is None:
+            return
+
+        with open(self._log_file, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._set_row(record["row"], record["id"], record["document"], record["metadata"])
+
+        capacity = os.path.getsize(self._vectors_file) // (4 * self.dim)
+        if capacity:
+            self._vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _reset(self):
+        self.ids, self.documents, self.metadatas = [], [], []
+        self._rows, self._hash_rows = {}, {}
+        self._vectors = None
+
+    def _wipe(self):
+        """Forget every row and remove the index files"""
+        self._reset()
+        for name in (self._vectors_file, self._log_file, self._meta_file):
+            if os.path.exists(name):
+                os.remove(name)
+        if not self._temporary:
+            try:
+                os.rmdir(self.path)
+            except OSError:
+                pass
+
+    def _create_files(self):
+        os.makedirs(self.path, exist_ok=True)
+        for name in (self._vectors_file, self._log_file):
+            open(name, "wb").close()
+        with open(self._meta_file, "w", encoding="utf-8") as f:
+            json.dump(self.metadata, f)
+
+    def _set_row(self, row, doc_id, document, metadata):
+        if row == len(self.ids):
+            self.ids.append(doc_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+        else:
+            self.ids[row], self.documents[row], self.metadatas[row] = doc_id, document, metadata
+        self._rows[doc_id] = row
+        if metadata and metadata.get("content_hash"):
+            self._hash_rows[metadata["content_hash"]] = row
+
+    def _ensure_capacity(self, needed):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+        # r+ extends the file to the new shape; existing rows stay where they are
+        self._vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+
+    # ---------- VectorBackend ----------
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            if not os.path.exists(self._meta_file):
+                self._create_files()
+            rows = []
+            next_row = len(self.ids)
+            for doc_id in ids:
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    self._rows[doc_id] = row
+                rows.append(row)
+
+            self._ensure_capacity(next_row)
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+
+            with open(self._log_file, "a", encoding="utf-8") as log:
+                for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas):
+                    self._set_row(row, doc_id, document, metadata)
+                    log.write(json.dumps({"row": row, "id": doc_id, "document": document, "metadata": metadata}) + "\n")
+
+    def search(self, query_embeddings, top_k):
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            n = len(self.ids)
+            if n == 0 or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+            k = min(top_k, n)
+
+            scores = np.asarray(self._vectors[:n]) @ queries.T  # (n, queries)
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+
+            results = []
+            for q in range(len(queries)):
+                rows = top[:, q]
+                rows = rows[np.argsort(-scores[rows, q])]
+                results.append([{
+                    'id': self.ids[row],
+                    'content': self.documents[row],
+                    'metadata': self.metadatas[row],
+                    'distance': float(1.0 - scores[row, q])
+                } for row in rows])
+            return results
+
+    def embeddings_for_hashes(self, hashes):
+        with self._lock:
+            rows = {h: self._hash_rows[h] for h in hashes if h in self._hash_rows}
+            return {h: np.asarray(self._vectors[row]).tolist() for h, row in rows.items()}
+
+    def count(self):
+        return len(self.ids)
+
+    def delete(self, ids):
+        """Drop rows and rewrite the matrix and chunk log without them"""
+        with self._lock:
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not drop:
+                return
+            keep = [row for row in range(len(self.ids)) if row not in drop]
+            if not keep:
+                self._wipe()
+                return
+            vectors = np.array(self._vectors[keep]) if keep else np.zeros((0, self.dim), dtype=np.float32)
+            self._keep_rows(keep)
+
+            self._vectors = None
+            with open(self._vectors_file, "wb") as f:
+                f.write(vectors.tobytes())
+            if len(vectors):
+                self._vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=vectors.shape)
+
+            tmp = self._log_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as log:
+                for row, (doc_id, document, metadata) in enumerate(zip(self.ids, self.documents, self.metadatas)):
+                    log.write(json.dumps({"row": row, "id": doc_id, "document": document, "metadata": metadata}) + "\n")
+            os.replace(tmp, self._log_file)
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._wipe()
+
+    def close(self):
+        """Drop the memmap; temporary (non-persistent) indexes also delete their files"""
+        with self._lock:
+            self._vectors = None
+            if self._temporary:
+                shutil.rmtree(self.path, ignore_errors=True)
@@ -1,70 +1,189 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import streamlit as st
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional
 import hashlib
+import os
+import re
+import threading
+import uuid
+import weakref
+import numpy as np
+from modules.bm25_index import BM25Index
+from modules.chunker import Chunk, approx_token_counts, iter_chunks
+from modules.embedding_cache import EmbeddingCache, content_hash, get_embedding_cache
+from modules.embedding_engine import get_embedding_engine
+from modules.query_cache import QueryResultCache
+from modules.quantized_index import QuantizedIndex, DTYPES as QUANTIZED_DTYPES
+from modules.vector_backends import VectorBackend, ChromaBackend, NumpyFlatBackend, get_chroma_client, hnsw_metadata
+
+# Stored on the collection so a warm start never mixes incompatible vectors
+SCHEMA_VERSION = 1
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_COLLECTION = "studysphere_docs"
+KB_COLLECTION_PREFIX = "studysphere_kb_"
+
+# Reciprocal-rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+# Tokens of trailing sentences repeated at the start of the next chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Chunk length assumed when deciding how many results could fill a RAG context budget
+RAG_MIN_CHUNK_CHARS = 400
+
+# Recent questions whose embeddings / results are kept in memory
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
 
 class VectorStore:
-    def __init__(self, collection_name="studysphere_docs"):
-        """Initialize ChromaDB with sentence transformers"""
-        self.client = chromadb.Client()
+    def __init__(self, collection_name=DEFAULT_COLLECTION, persist_dir=None, storage=None, backend=None,
+                 hnsw=None):
+        """Initialize the vector store with sentence-transformer embeddings
+
+        backend (or VECTOR_BACKEND) picks "chroma" (default) or "numpy", an exact
+        scan over a memory-mapped float32 matrix. storage (or VECTOR_STORAGE) =
+        "float16" / "int8" keeps vectors in a compact in-process index instead.
+        With persist_dir (or CHROMA_DIR) the knowledge base is kept on disk and
+        reopened on restart instead of being re-embedded. hnsw overrides the
+        Chroma index settings (see vector_backends.hnsw_metadata / HNSW_* env).
+        """
+        # Use MiniLM for fast embeddings; vectors are computed outside the backend.
+        # The model and chunk embedding cache are shared by every VectorStore in the process.
+        self.embedding_function = get_embedding_engine(EMBEDDING_MODEL)
+        self.embedding_cache = get_embedding_cache()
+        self._token_counter = None
+        self.collection_name = collection_name
+        self.persist_dir = persist_dir or os.getenv("CHROMA_DIR")
         
-        # Use MiniLM for fast embeddings
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        self.storage = (storage or os.getenv("VECTOR_STORAGE", "float32")).lower()
+        self.backend_name = (backend or os.getenv("VECTOR_BACKEND", "chroma")).lower()
+        self.hnsw = hnsw if hnsw is not None else self._hnsw_from_env()
+        self.backend = self._create_backend()
+        # Guards the source index, version and lexical index, which every session sharing this store updates
+        self._lock = threading.RLock()
         
-        try:
-            self.collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
+        # Keyword index for hybrid search; rebuilt from stored chunks on first use after a warm start
+        self.lexical = BM25Index()
+        self._lexical_synced = self.backend.count() == 0
+        self._sources = None
+        
+        # Bumped on every add/clear; cached results from an older version are discarded
+        self.version = 0
+        self.query_embeddings = EmbeddingCache(max_mb=8, max_items=QUERY_CACHE_SIZE)
+        self.query_results = QueryResultCache(max_items=QUERY_CACHE_SIZE)
+    
+    def _collection_metadata(self):
+        return {"schema_version": SCHEMA_VERSION, "embedding_model": EMBEDDING_MODEL}
+    
+    @staticmethod
+    def _hnsw_from_env():
+        def env_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+        return hnsw_metadata(
+            space=os.getenv("HNSW_SPACE") or None,
+            M=env_int("HNSW_M"),
+            construction_ef=env_int("HNSW_CONSTRUCTION_EF"),
+            search_ef=env_int("HNSW_SEARCH_EF")
+        )
+    
+    def _create_backend(self) -> VectorBackend:
+        if self.storage in QUANTIZED_DTYPES:
+            if self.persist_dir:
+                st.warning(f"VECTOR_STORAGE={self.storage} keeps the knowledge base in memory only; "
+                           f"{self.persist_dir} is not used and it will be rebuilt on restart.")
+            return QuantizedIndex(
+                dtype=self.storage,
+                rescore=os.getenv("VECTOR_RESCORE", "1") != "0"
             )
-        except:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
+        if self.backend_name == "numpy":
+            path = os.path.join(self.persist_dir, self.collection_name) if self.persist_dir else None
+            return NumpyFlatBackend(path, metadata=self._collection_metadata())
+        if self.backend_name == "chroma":
+            return ChromaBackend(
+                self.collection_name,
+                self.embedding_function,
+                self._collection_metadata(),
+                persist_dir=self.persist_dir,
+                hnsw=self.hnsw
             )
+        raise ValueError(f"Unknown VECTOR_BACKEND '{self.backend_name}'. Choose chroma or numpy.")
     
-    def chunk_text(self, text: str, chunk_size=500, overlap=50) -> List[str]:
-        """Split text into overlapping chunks"""
-        words = text.split()
-        chunks = []
+    def _count_tokens(self, texts: List[str]) -> List[int]:
+        """Token counts from the embedding model's tokenizer, or an estimate if it can't be loaded"""
+        if self._token_counter is None:
+            try:
+                self.embedding_function.count_tokens([""])
+                self._token_counter = self.embedding_function.count_tokens
+            except Exception:
+                self._token_counter = approx_token_counts
+        return self._token_counter(texts)
+    
+    def chunk_text(self, text: str, doc_id: str = "") -> List[str]:
+        """Split text into overlapping, sentence-aligned chunks"""
+        return [chunk.text for chunk in self.chunk_stream([text], doc_id)]
+    
+    def chunk_stream(self, pages: Iterable[str], doc_id: str = "") -> Iterator[Chunk]:
+        """Chunk a stream of page texts into spans that fit the embedding model's token window"""
+        return iter_chunks(pages, doc_id, max_tokens=self.embedding_function.max_tokens,
+                           overlap_tokens=CHUNK_OVERLAP_TOKENS, count_tokens=self._count_tokens)
+    
+    def embed(self, texts: List[str], hashes: Optional[List[str]] = None) -> List[List[float]]:
+        """Compute embeddings for a batch of texts, reusing any vector already computed
+
+        Lookups go to the in-process cache first, then to chunks already stored in
+        the collection (by content hash); only the remainder reaches the model.
+        """
+        hashes = hashes or [content_hash(t) for t in texts]
+        found = self.embedding_cache.get_many(hashes)
         
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk.strip())
+        missing = list({h for h in hashes if h not in found})
+        if missing:
+            stored = self._stored_embeddings(missing)
+            found.update(stored)
+            self.embedding_cache.put_many(stored)
         
-        return chunks
+        todo = {}
+        for h, text in zip(hashes, texts):
+            if h not in found:
+                todo.setdefault(h, text)
+        if todo:
+            computed = dict(zip(todo, self.embedding_function.encode(list(todo.values()))))
+            found.update(computed)
+            self.embedding_cache.put_many(computed)
+        
+        return [np.asarray(found[h], dtype=np.float32).tolist() for h in hashes]
+    
+    def _stored_embeddings(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Embeddings of already-stored chunks whose text hash is in `hashes`"""
+        try:
+            return self.backend.embeddings_for_hashes(hashes)
+        except Exception:
+            return {}
     
     def add_documents(self, text: str, source: str = "uploaded_file"):
-        """Add documents to vector store with chunking"""
+        """Add (or replace) a source's text in the vector store with chunking
+
+        Chunks whose text was already stored reuse their embeddings, so re-adding
+        an edited document only embeds the changed chunks; chunks that are no
+        longer in the text are deleted.
+        """
         try:
-            chunks = self.chunk_text(text)
+            chunks = self.chunk_text(text, source)
             
             if not chunks:
                 st.warning("No text chunks created")
                 return 0
             
-            # Create unique IDs using hash
-            ids = [hashlib.md5(f"{source}_{i}_{chunk[:50]}".encode()).hexdigest() 
-                   for i, chunk in enumerate(chunks)]
-            
-            # Add metadata
-            metadatas = [{"source": source, "chunk_id": i} for i in range(len(chunks))]
+            # Embed everything in one call so the engine can batch / fan out across cores
+            embeddings = self.embed(chunks)
             
             # Add to collection in batches for speed
             batch_size = 100
+            written = set()
             for i in range(0, len(chunks), batch_size):
-                batch_chunks = chunks[i:i + batch_size]
-                batch_ids = ids[i:i + batch_size]
-                batch_metadata = metadatas[i:i + batch_size]
-                
-                self.collection.add(
-                    documents=batch_chunks,
-                    ids=batch_ids,
-                    metadatas=batch_metadata
-                )
+                written.update(self.add_chunk_batch(chunks[i:i + batch_size], source, start_index=i,
+                                                    embeddings=embeddings[i:i + batch_size]))
+            self.prune_source(source, written)
             
             return len(chunks)
         
@@ -72,48 +191,182 @@ class VectorStore:
             st.error(f"Error adding documents: {e}")
             return 0
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Semantic search for relevant chunks"""
+    def add_chunk_batch(self, chunks: List[str], source: str, start_index: int = 0,
+                        embeddings: Optional[List[List[float]]] = None) -> List[str]:
+        """Upsert one batch of chunks and return their ids; chunk_id metadata continues from start_index
+
+        IDs depend only on source and content, so adding the same document again
+        overwrites its unchanged chunks in place instead of duplicating them.
+        """
+        hashes = [content_hash(chunk) for chunk in chunks]
+        if embeddings is None:
+            embeddings = self.embed(chunks, hashes)
+        
+        # A chunk repeated within the batch would produce a duplicate id
+        ids, rows = [], []
+        for i, h in enumerate(hashes):
+            doc_id = hashlib.md5(f"{source}_{h}".encode()).hexdigest()
+            if doc_id not in ids:
+                ids.append(doc_id)
+                rows.append(i)
+        
+        # Add metadata
+        metadatas = [{"source": source, "chunk_id": start_index + i, "content_hash": hashes[i]} for i in rows]
+        chunks = [chunks[i] for i in rows]
+        
+        with self._lock:
+            self.backend.upsert(ids, [embeddings[i] for i in rows], chunks, metadatas)
+            if self._lexical_synced:
+                self.lexical.add_many(zip(ids, chunks))
+            if self._sources is not None:
+                self._sources.setdefault(source, {}).update(zip(ids, (hashes[i] for i in rows)))
+            self._bump_version()
+        return ids
+    
+    def _source_index(self) -> Dict[str, Dict[str, str]]:
+        """source -> {chunk id: content hash}, read from stored metadata once and then kept in step"""
+        with self._lock:
+            if self._sources is None:
+                sources = {}
+                for doc_id, metadata in self.backend.all_metadatas():
+                    metadata = metadata or {}
+                    sources.setdefault(metadata.get("source", "unknown"), {})[doc_id] = metadata.get("content_hash")
+                self._sources = sources
+            return self._sources
+    
+    def list_sources(self) -> Dict[str, int]:
+        """Chunk count per source"""
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=top_k
-            )
-            
-            if not results['documents'] or not results['documents'][0]:
-                return []
+            with self._lock:
+                counts = {source: len(ids) for source, ids in self._source_index().items()}
+            return dict(sorted(counts.items()))
+        except Exception as e:
+            st.error(f"Error listing sources: {e}")
+            return {}
+    
+    def delete_source(self, source: str) -> int:
+        """Delete every chunk of one source; returns how many were removed"""
+        try:
+            with self._lock:
+                return self._delete_chunks(source, list(self._source_index().get(source, {})))
+        except Exception as e:
+            st.error(f"Error deleting {source}: {e}")
+            return 0
+    
+    def prune_source(self, source: str, keep_ids) -> int:
+        """Delete a source's chunks that are not in keep_ids (left over from an older version)"""
+        with self._lock:
+            stale = [doc_id for doc_id in self._source_index().get(source, {}) if doc_id not in keep_ids]
+            return self._delete_chunks(source, stale)
+    
+    def _delete_chunks(self, source: str, ids: List[str]) -> int:
+        if not ids:
+            return 0
+        with self._lock:
+            self.backend.delete(ids)
+            for doc_id in ids:
+                self.lexical.remove(doc_id)
+            remaining = self._source_index().get(source, {})
+            for doc_id in ids:
+                remaining.pop(doc_id, None)
+            if not remaining:
+                self._sources.pop(source, None)
+            self._bump_version()
+        return len(ids)
+    
+    def _bump_version(self):
+        with self._lock:
+            self.version += 1
+            self.query_results.clear()
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings of search queries in one batched call, memoised so repeated questions skip the model"""
+        keys = [content_hash(q) for q in queries]
+        found = self.query_embeddings.get_many(keys)
+        
+        todo = {}
+        for key, query in zip(keys, queries):
+            if key not in found:
+                todo.setdefault(key, query)
+        if todo:
+            computed = dict(zip(todo, self.embedding_function.encode(list(todo.values()))))
+            found.update(computed)
+            self.query_embeddings.put_many(computed)
+        
+        return [np.asarray(found[key], dtype=np.float32).tolist() for key in keys]
+    
+    def search(self, query: str, top_k: int = 5, mode: str = "dense") -> List[Dict]:
+        """Semantic search for relevant chunks; mode="hybrid" fuses in BM25 keyword matches"""
+        return self.search_many([query], top_k, mode)[0]
+    
+    def search_many(self, queries: List[str], top_k: int = 5, mode: str = "dense") -> List[List[Dict]]:
+        """Search for several queries at once: one batched encode and one multi-query lookup
+
+        Returns one result list per query, in the same shape as search().
+        """
+        try:
+            version = self.version
+            results = [self.query_results.get((mode, q), version, top_k) for q in queries]
+            todo = list(dict.fromkeys(q for q, r in zip(queries, results) if r is None))
+            if not todo:
+                return results
             
-            # Format results
-            formatted_results = []
-            for i, doc in enumerate(results['documents'][0]):
-                formatted_results.append({
-                    'content': doc,
-                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                    'distance': results['distances'][0][i] if results['distances'] else 0
-                })
+            fetch = max(top_k * 4, 20) if mode == "hybrid" else top_k
+            dense = self.backend.search(self.embed_queries(todo), fetch)
+            if mode == "hybrid":
+                self._ensure_lexical()
+                dense = [self._fuse(q, hits, top_k, fetch) for q, hits in zip(todo, dense)]
             
-            return formatted_results
+            fresh = dict(zip(todo, dense))
+            for q, hits in fresh.items():
+                self.query_results.put((mode, q), version, top_k, hits)
+            return [r if r is not None else [dict(hit) for hit in fresh[q]]
+                    for q, r in zip(queries, results)]
         
         except Exception as e:
             st.error(f"Search error: {e}")
+            return [[] for _ in queries]
+    
+    def _ensure_lexical(self):
+        with self._lock:
+            if not self._lexical_synced:
+                self.lexical.add_many(self.backend.all_documents())
+                self._lexical_synced = True
+    
+    def _fuse(self, query: str, dense: List[Dict], top_k: int, fetch: int) -> List[Dict]:
+        """Reciprocal-rank fusion of a query's dense hits with its BM25 ranking"""
+        lexical = self.lexical.search(query, fetch)
+        
+        fused = {}
+        for ranking in ([r['id'] for r in dense], [doc_id for doc_id, _ in lexical]):
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        top = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        if not top:
             return []
+        
+        by_id = {r['id']: r for r in dense}
+        by_id.update({r['id']: r for r in self.backend.get([i for i in top if i not in by_id])})
+        
+        # distance stays the dense one (None for keyword-only hits); score is the fused RRF score
+        return [dict(by_id[doc_id], score=fused[doc_id]) for doc_id in top if doc_id in by_id]
     
     def get_count(self) -> int:
         """Get number of chunks in collection"""
         try:
-            return self.collection.count()
+            return self.backend.count()
         except:
             return 0
     
     def clear_collection(self):
         """Clear all documents from collection"""
         try:
-            # Delete and recreate collection
-            self.client.delete_collection(self.collection.name)
-            self.collection = self.client.create_collection(
-                name=self.collection.name,
-                embedding_function=self.embedding_function
-            )
+            with self._lock:
+                self.backend.clear()
+                self.lexical.clear()
+                self._lexical_synced = True
+                self._sources = {}
+                self._bump_version()
             return True
         except Exception as e:
             st.error(f"Error clearing collection: {e}")
@@ -123,9 +376,94 @@ class VectorStore:
         """Retrieve relevant context for RAG"""
         results = self.search(question, top_k=top_k)
         
-        if not results:
-            return ""
-        
         # Combine top results
-        context = "\n\n".join([r['content'] for r in results])
-        return context
\ No newline at end of file
+        return "\n\n".join([r['content'] for r in results])
+    
+    def rag_retrieve_many(self, question: str, budgets: List[int]) -> List[str]:
+        """Contexts of the best chunks that fit each character budget, from a single search
+
+        Budgets are in characters rather than chunks because chunk size follows
+        the embedding model's token window; the best chunk is always included.
+        """
+        # Enough candidates to fill the largest budget with fairly short chunks
+        results = self.search(question, top_k=max(1, -(-max(budgets) // RAG_MIN_CHUNK_CHARS)))
+        
+        contexts = []
+        for budget in budgets:
+            parts, used = [], 0
+            for r in results:
+                if parts and used + len(r['content']) > budget:
+                    break
+                parts.append(r['content'])
+                used += len(r['content']) + 2
+            contexts.append("\n\n".join(parts))
+        return contexts
+
+
+_stores = weakref.WeakValueDictionary()
+_stores_lock = threading.Lock()
+
+
+def new_kb_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def collection_for_kb(kb: str) -> str:
+    """Collection name for a knowledge base id ("default" = the original shared collection)"""
+    name = re.sub(r"[^A-Za-z0-9_-]", "", kb or "")[:40].strip("_-")
+    if name == "default":
+        return DEFAULT_COLLECTION
+    # ids with no usable characters still map to a stable collection of their own
+    return f"{KB_COLLECTION_PREFIX}{name or hashlib.md5((kb or '').encode()).hexdigest()[:12]}"
+
+
+def kb_for_collection(collection_name: str) -> Optional[str]:
+    """Knowledge base id of a collection made by collection_for_kb, or None for any other collection"""
+    if collection_name == DEFAULT_COLLECTION:
+        return "default"
+    if collection_name.startswith(KB_COLLECTION_PREFIX):
+        return collection_name[len(KB_COLLECTION_PREFIX):]
+    return None
+
+
+def list_knowledge_bases() -> List[str]:
+    """Ids of the knowledge bases that hold documents, "default" first if it is one of them"""
+    names = set()
+    with _stores_lock:
+        stores = list(_stores.values())
+    names.update(store.collection_name for store in stores if store.get_count() > 0)
+    
+    # Knowledge bases stored by this server but not open in any session
+    persist_dir = os.getenv("CHROMA_DIR")
+    if os.getenv("VECTOR_STORAGE", "float32").lower() not in QUANTIZED_DTYPES:
+        if os.getenv("VECTOR_BACKEND", "chroma").lower() == "numpy":
+            if persist_dir and os.path.isdir(persist_dir):
+                for name in os.listdir(persist_dir):
+                    vectors = os.path.join(persist_dir, name, "vectors.f32")
+                    if os.path.exists(vectors) and os.path.getsize(vectors) > 0:
+                        names.add(name)
+        else:
+            try:
+                names.update(c.name for c in get_chroma_client(persist_dir).list_collections() if c.count() > 0)
+            except Exception:
+                pass
+    
+    kbs = sorted(kb for kb in map(kb_for_collection, names) if kb is not None)
+    if "default" in kbs:
+        kbs.remove("default")
+        kbs.insert(0, "default")
+    return kbs
+
+
+def get_vector_store(collection_name: str = DEFAULT_COLLECTION) -> VectorStore:
+    """VectorStore handle for a collection, shared by every session that uses it
+
+    Handles are held weakly: once no session references one it is dropped
+    (and an in-memory collection with it).
+    """
+    with _stores_lock:
+        store = _stores.get(collection_name)
+        if store is None:
+            store = VectorStore(collection_name)
+            _stores[collection_name] = store
+        return store
@@ -0,0 +1,77 @@
+"""
+Embedding backend parity check for StudySphere AI
+Compares the ONNX (fp32 and int8) backends against the torch sentence-transformers backend
+
+Usage: python test_embedding_parity.py
+Exports the ONNX model on first run (needs torch + onnxruntime for that step).
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from modules.embedding_engine import EmbeddingEngine, OnnxEmbeddingEngine
+
+# Minimum mean cosine similarity to the torch vectors for each backend
+THRESHOLDS = {"onnx": 0.999, "onnx-int8": 0.98}
+
+SAMPLE_TEXTS = [
+    "Attention is all you need: the Transformer relies entirely on self-attention.",
+    "Air pollution is a critical global crisis affecting human health and climate.",
+    "Python was conceived in the late 1980s by Guido van Rossum at CWI.",
+    "Theorem 3.2 states that every bounded monotone sequence converges.",
+    "An autoencoder learns a compressed representation of its input.",
+    "Self-RAG retrieves passages on demand and critiques its own generations.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The derivative of sin(x) is cos(x).",
+]
+
+
+def load_corpus(n=512):
+    """Sample sentences, repeated with variations to make a throughput-sized batch"""
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} (variant {i})" for i in range(n)]
+
+
+def throughput(engine, texts):
+    engine.encode(texts[:16])  # warm-up: model load / session init
+    start = time.perf_counter()
+    vectors = np.asarray(engine.encode(texts))
+    return vectors, len(texts) / (time.perf_counter() - start)
+
+
+def cosine_rows(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    print("=" * 60)
+    print("🔢 Embedding Backend Parity Check (all-MiniLM-L6-v2)")
+    print("=" * 60)
+
+    texts = load_corpus()
+    reference, torch_rate = throughput(EmbeddingEngine(processes=1), texts)
+    print(f"\ntorch       {torch_rate:8.1f} texts/s   (reference)")
+
+    failed = []
+    for name, engine in [("onnx", OnnxEmbeddingEngine()), ("onnx-int8", OnnxEmbeddingEngine(quantized=True))]:
+        vectors, rate = throughput(engine, texts)
+        cos = cosine_rows(reference, vectors)
+        ok = cos.mean() >= THRESHOLDS[name]
+        status = "✅" if ok else "❌"
+        print(f"{name:<11} {rate:8.1f} texts/s   x{rate / torch_rate:4.2f}   "
+              f"cosine mean {cos.mean():.5f} min {cos.min():.5f}  {status}")
+        if not ok:
+            failed.append(name)
+
+    if failed:
+        print(f"\n⚠️  Parity below threshold for: {', '.join(failed)}")
+        return 1
+    print("\n🎉 All backends agree with torch")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())